@@ -4,143 +4,30 @@
 # In[ ]:
 
 
-import streamlit as st
-import pandas as pd
-import io
-from io import BytesIO
-import math
-from PIL import Image
-
-# Define your CSV file paths here (use raw strings or double backslashes)
-swl_csv = 'excavator_swl.csv'  # Ensure this file exists
-bucket_csv = 'bucket_data.csv'  # Make sure this file exists
-bhc_bucket_csv = 'bhc_bucket_data.csv'  # Make sure this file exists
-dump_truck_csv = 'dump_trucks.csv'  # Path to dump truck CSV
-
-# Function to generate Excel file
-def generate_excel(df):
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False, sheet_name='Productivity Study')
-    # Return the Excel content as bytes
-    return output.getvalue()
-
-# Load datasets
-def load_bucket_data(bucket_csv):
-    return pd.read_csv(bucket_csv)
-
-def load_bhc_bucket_data(bhc_bucket_csv):
-    return pd.read_csv(bhc_bucket_csv)
-
-def load_dump_truck_data(dump_truck_csv):
-    return pd.read_csv(dump_truck_csv)
-
-def load_excavator_swl_data(swl_csv):
-    swl_data = pd.read_csv(swl_csv)
-    swl_data['boom_length'] = pd.to_numeric(swl_data['boom_length'], errors='coerce')
-    swl_data['arm_length'] = pd.to_numeric(swl_data['arm_length'], errors='coerce')
-    swl_data['CWT'] = pd.to_numeric(swl_data['CWT'], errors='coerce')
-    swl_data['shoe_width'] = pd.to_numeric(swl_data['shoe_width'], errors='coerce')
-    swl_data['reach'] = pd.to_numeric(swl_data['reach'], errors='coerce')
-    swl_data['class'] = pd.to_numeric(swl_data['class'], errors='coerce')
-    return swl_data
-
-def generate_html_table(data, title):
-    """
-    Generate a simple HTML table from a dictionary where keys are column headers
-    and values are lists of data. The table will have a dynamic title, styled for dark mode.
-    """
-    # Extract headers dynamically from the keys of the data dictionary
-    headers = list(data.keys())
-    
-    # Find the maximum length of the lists (rows) in the data dictionary
-    num_rows = max(len(data[header]) for header in headers)
-    
-    # Start the HTML table structure with fixed table width
-    html = """
-    <style>
-        /* Global styles for Dark Mode */
-        body {
-            background-color: #121212; /* Dark background for the body */
-            color: #e0e0e0; /* Light text for dark mode */
-            font-family: Arial, sans-serif;
-            margin: 0;
-            padding: 20px;
-        }
-        table {
-            width: 100%; /* Set a fixed width for the table */
-            margin: 0 auto; /* Center the table horizontally */
-            border-collapse: collapse;
-            font-size: 16px;
-            text-align: left;
-            background-color: #1e1e1e; /* Table background for dark mode */
-            color: #e0e0e0; /* Light text for table content */
-            border-radius: 8px; /* Rounded corners for modern look */
-        }
-        th, td {
-            padding: 12px 15px;
-            border: 1px solid #333; /* Border color for dark mode */
-            text-align: center; /* Centered text for better readability */
-        }
-        th {
-            background-color: #1e1e1e; /* Pale yellow-orange color for headers */
-            color: #ffffff; /* White text for headers */
-            font-weight: bold;
-        }
-        tr:nth-child(even) {
-            background-color: #2a2a2a; /* Slightly lighter row for contrast */
-        }
-        tr:nth-child(odd) {
-            background-color: #1e1e1e; /* Darker odd rows */
-        }
-        tr:hover {
-            background-color: #444; /* Highlight row on hover */
-        }
-        h3 {
-            font-size: 22px;
-            color: #f4c542; /* Orange color for the title */
-            font-weight: bold;
-            border-bottom: 2px solid #f4c542;
-            padding-bottom: 5px;
-            margin-bottom: 5px; /* Reduced margin to remove gap */
-        }
-        /* Optionally style the container for better layout */
-        .table-container {
-            background-color: #181818;
-            padding: 15px;
-            border-radius: 10px;
-        }
-    </style>
-    """
-    
-    # Use the title for both the h3 and table
-    html += f"<h3>{title}</h3>"
-    html += '<div class="table-container">'
-    html += "<table><thead><tr>"
-    
-    # Add table headers
-    for header in headers:
-        html += f"<th>{header}</th>"
-    
-    html += "</tr></thead><tbody>"
-    
-    # Add rows to the table, ensuring to handle any missing data gracefully
-    for i in range(num_rows):
-        html += "<tr>"
-        for header in headers:
-            value = data[header][i] if i < len(data[header]) else ""
-            html += f"<td>{value}</td>"
-        html += "</tr>"
-    
-    html += "</tbody></table>"
-    html += "</div>"
-    
-    return html
+import html
+from functools import partial
 
+import streamlit as st
 
-# Load the data
-dump_truck_data = load_dump_truck_data(dump_truck_csv)
-swl_data = load_excavator_swl_data(swl_csv)
+from xmor import timing
+from xmor.catalog import get_catalog
+from xmor.core import NO_MATCHING_CONFIGURATION, NO_SUITABLE_BUCKET, StudyInputs, compute_study, sweep_reaches, sweep_table
+from xmor.fleet import fleet_table, site_table, site_totals, study_fleet
+from xmor.images import bucket_image
+from xmor.montecarlo import simulate_study, spread, uniform
+from xmor.optimizer import MAX_PASSES, MIN_PASSES, rank_matches, ranking_table
+from xmor.simulation import simulate_loadout
+from xmor.render import generate_html_table
+from xmor.report import study_workbook
+
+# Time this rerun's stages when XMOR_TIMING is set (see xmor/timing.py)
+rerun = timing.start_run('rerun')
+
+# Load the data (parsed once per process, reloaded only when a CSV changes)
+with timing.stage('catalog'):
+    catalog = get_catalog()
+    dump_truck_data = catalog.dump_truck_data
+    swl_data = catalog.swl_data
 
 #APP
 # Main Streamlit App UI
@@ -151,32 +38,33 @@ def app():
 st.title("ONTRAC XMOR® Bucket Solution\n\n")
 st.title("Excavator Selection")
 
+# Each step reads its options from the prebuilt selector index instead of
+# filtering swl_data again at every level
+selector = catalog.selector_index
+
 # Step 1: Select Excavator Make
-excavator_make = st.selectbox("Select Excavator Make", swl_data['make'].unique())
+excavator_make = st.selectbox("Select Excavator Make", selector.options())
 
-# Step 2: Filter by selected make and select Excavator Model
-filtered_data_make = swl_data[swl_data['make'] == excavator_make]
-excavator_model = st.selectbox("Select Excavator Model", filtered_data_make['model'].unique())
+# Step 2: Select Excavator Model for the selected make
+excavator_model = st.selectbox("Select Excavator Model", selector.options(excavator_make))
 
-# Step 3: Filter by selected model and select Boom Length
-filtered_data_model = filtered_data_make[filtered_data_make['model'] == excavator_model]
-boom_length = st.selectbox("Select Boom Length (m)", filtered_data_model['boom_length'].unique())
+# Step 3: Select Boom Length for the selected model
+boom_length = st.selectbox("Select Boom Length (m)", selector.options(excavator_make, excavator_model))
 
-# Step 4: Filter further by selected boom length and select Arm Length
-filtered_data_boom = filtered_data_model[filtered_data_model['boom_length'] == boom_length]
-arm_length = st.selectbox("Select Arm Length (m)", filtered_data_boom['arm_length'].unique())
+# Step 4: Select Arm Length for the selected boom length
+arm_length = st.selectbox("Select Arm Length (m)", selector.options(excavator_make, excavator_model, boom_length))
 
-# Step 5: Filter further by selected arm length and select Counterweight
-filtered_data_arm = filtered_data_boom[filtered_data_boom['arm_length'] == arm_length]
-cwt = st.selectbox("Select Counterweight (CWT in kg)", filtered_data_arm['CWT'].unique())
+# Step 5: Select Counterweight for the selected arm length
+cwt = st.selectbox("Select Counterweight (CWT in kg)",
+                   selector.options(excavator_make, excavator_model, boom_length, arm_length))
 
-# Step 6: Filter further by selected counterweight and select Shoe Width
-filtered_data_cwt = filtered_data_arm[filtered_data_arm['CWT'] == cwt]
-shoe_width = st.selectbox("Select Shoe Width (mm)", filtered_data_cwt['shoe_width'].unique())
+# Step 6: Select Shoe Width for the selected counterweight
+shoe_width = st.selectbox("Select Shoe Width (mm)",
+                          selector.options(excavator_make, excavator_model, boom_length, arm_length, cwt))
 
-# Step 7: Filter further by selected shoe width and select Reach
-filtered_data_shoe = filtered_data_cwt[filtered_data_cwt['shoe_width'] == shoe_width]
-reach = st.selectbox("Select Operating Reach (m)", filtered_data_shoe['reach'].unique())
+# Step 7: Select Reach for the selected shoe width
+reach = st.selectbox("Select Operating Reach (m)",
+                     selector.options(excavator_make, excavator_model, boom_length, arm_length, cwt, shoe_width))
 
 # Dump truck inputs
 st.title("Dump Truck Selection")
@@ -199,83 +87,39 @@ machine_swings_per_minute = st.number_input("Machine Swings per Minute", min_val
 # Checkbox for BHC buckets
 select_bhc = st.checkbox("Select from BHC buckets only (Heavy Duty)")
 
-# Function to calculate SWL match
-def find_matching_swl(user_data):
-    matching_excavator = swl_data[
-        (swl_data['make'] == user_data['make']) &
-        (swl_data['model'] == user_data['model']) &
-        (swl_data['CWT'] == user_data['cwt']) &
-        (swl_data['shoe_width'] == user_data['shoe_width']) &
-        (swl_data['reach'] == user_data['reach']) &
-        (swl_data['boom_length'] == user_data['boom_length']) &
-        (swl_data['arm_length'] == user_data['arm_length'])
-    ]
-    if matching_excavator.empty:
-        return None
-    swl = matching_excavator.iloc[0]['swl']
-    return swl
-
-# Function to calculate bucket load
-def calculate_bucket_load(bucket_size, material_density):
-    return bucket_size * material_density
-
-def adjust_payload_for_new_bucket(dump_truck_payload, new_payload):
-    max_payload = dump_truck_payload * 1.10  # Allow up to 10% adjustment
-    increment = dump_truck_payload * 0.001   # Fine adjustment increments
-
-    # Try to achieve swing values within ±0.14 tolerance
-    current_payload = dump_truck_payload
-    while current_payload <= max_payload:
-        swings_to_fill_truck_new = current_payload / new_payload
-        if abs(swings_to_fill_truck_new - math.ceil(swings_to_fill_truck_new)) <= 0.05:
-            return current_payload, swings_to_fill_truck_new
-        current_payload += increment
-
-    # If no suitable payload is found, return the original payload with calculated swings
-    swings_to_fill_truck_new = dump_truck_payload / new_payload
-    return dump_truck_payload, swings_to_fill_truck_new
-
-def adjust_payload_for_old_bucket(dump_truck_payload, old_payload):
-    max_payload = dump_truck_payload * 1.10  # Allow up to 10% adjustment
-    increment = dump_truck_payload * 0.001   # Fine adjustment increments
-
-    # Try to achieve swing values within ±0.14 tolerance
-    current_payload = dump_truck_payload
-    while current_payload <= max_payload:
-        swings_to_fill_truck_old = current_payload / old_payload
-        if abs(swings_to_fill_truck_old - math.ceil(swings_to_fill_truck_old)) <= 0.05:
-            return current_payload, swings_to_fill_truck_old
-        current_payload += increment
-
-    # If no suitable payload is found, return the original payload with calculated swings
-    swings_to_fill_truck_old = dump_truck_payload / old_payload
-    return dump_truck_payload, swings_to_fill_truck_old
-
-def select_optimal_bucket(user_data, bucket_data, swl):
-    current_bucket_size = user_data['current_bucket_size']
-    optimal_bucket = None
-    highest_bucket_size = 0
-
-    selected_model = user_data['model']
-    excavator_class = swl_data[swl_data['model'] == selected_model]['class'].iloc[0]
-
-    for index, bucket in bucket_data.iterrows():
-        if bucket['class'] > excavator_class + 10:
-            continue
-
-        bucket_load = calculate_bucket_load(bucket['bucket_size'], user_data['material_density'])
-        total_bucket_weight = user_data['quick_hitch_weight'] + bucket_load + bucket['bucket_weight']
-
-        if total_bucket_weight <= swl and bucket['bucket_size'] > highest_bucket_size:
-            highest_bucket_size = bucket['bucket_size']
-            optimal_bucket = {
-                'bucket_name': bucket['bucket_name'],
-                'bucket_size': highest_bucket_size,
-                'bucket_weight': bucket['bucket_weight'],
-                'total_bucket_weight': total_bucket_weight
-            }
-
-    return optimal_bucket
+# Optional percentile bands over shift-to-shift variation in site conditions
+simulate_variability = st.checkbox("Simulate site variability (Monte Carlo)")
+if simulate_variability:
+    density_variation = st.slider("Material Density Variation (± %)", 0, 50, 10)
+    swing_rate_variation = st.slider("Swing Rate Variation (± %)", 0, 50, 15)
+    efficiency_range = st.slider("Loadout Efficiency Range", 0.3, 1.0, (0.65, 0.85))
+    cycle_factor_range = st.slider("XMOR® Cycle Time Factor Range", 1.0, 1.3, (1.05, 1.15))
+
+# Optional ranking of every truck against every bucket (BHB and BHC) the machine can carry
+rank_combinations = st.checkbox("Rank all truck and bucket combinations")
+
+# Optional shift simulation with queueing trucks, in place of the fixed loadout efficiency
+simulate_fleet = st.checkbox("Simulate a 12-hour shift with a truck fleet")
+if simulate_fleet:
+    fleet_size = st.number_input("Trucks in Fleet", min_value=1, max_value=50, value=4, step=1)
+    haul_minutes = st.number_input("Haul Cycle Time (min)", help="Travel loaded, dump and return", min_value=1.0,
+                                   value=12.0)
+
+# Optional sweep of the optimal bucket across every reach of the selected configuration
+sweep_reach = st.checkbox("Sweep all reaches for this configuration")
+if sweep_reach:
+    reach_step = st.select_slider("Reach Step (m)", options=["Chart reaches", 0.1, 0.25, 0.5],
+                                  value="Chart reaches")
+
+# Optional site-wide comparison of every machine in an uploaded fleet list
+compare_fleet = st.checkbox("Compare a whole site fleet from a spreadsheet")
+if compare_fleet:
+    fleet_file = st.file_uploader(
+        "Fleet List (CSV or XLSX)", type=["csv", "xlsx"],
+        help="One row per machine: make, model, boom_length, arm_length, cwt, shoe_width, reach, "
+             "current_bucket_size, current_bucket_weight, machine_swings_per_minute, and dump_truck_payload "
+             "or truck_model. Optional: quick_hitch_weight, material_density (defaults to the density above), "
+             "select_bhc.")
 
 # Get user input data
 user_data = {
@@ -300,264 +144,142 @@ calculate_button = st.button("Calculate")
 
 # Run calculations only when the button is pressed
 if calculate_button:
-    swl = find_matching_swl(user_data)
-    if swl:
-        # Load selected bucket data
-        selected_bucket_csv = bhc_bucket_csv if select_bhc else bucket_csv
-        bucket_data = load_bucket_data(selected_bucket_csv)
-    
-        optimal_bucket = select_optimal_bucket(user_data, bucket_data, swl)
-    
-        if optimal_bucket:
-
-            #st.write(f"Total Suspended Load (XMOR® Bucket): {optimal_bucket['total_bucket_weight']:.0f}kg")
-            #st.write(f"Safe Working Load at {user_data['reach']}m reach ({user_data['make']} {user_data['model']}): {swl:.0f}kg")
-            #st.write(" ")
-            #st.write(f"Calculations based on the {user_data['make']} {user_data['model']} with a {user_data['boom_length']}m boom, {user_data['arm_length']}m arm, {user_data['cwt']}kg counterweight, {user_data['shoe_width']}mm shoes, operating at a reach of {user_data['reach']}m, and with a material density of {user_data['material_density']:.0f}kg/m³.")
-            #st.write(f"Dump Truck: {truck_brand} {truck_model}, Rated payload = {user_data['dump_truck_payload'] * 1000 :.0f}kg")
-
-            # Show table
-            old_capacity = user_data['current_bucket_size']
-            new_capacity = optimal_bucket['bucket_size']
-            old_payload = calculate_bucket_load(old_capacity, user_data['material_density'])
-            new_payload = calculate_bucket_load(new_capacity, user_data['material_density'])
-    
-            dump_truck_payload = user_data['dump_truck_payload'] * 1000
-            machine_swings_per_minute = user_data['machine_swings_per_minute']
-    
-            # Total suspended load
-            old_total_load = old_payload + user_data['current_bucket_weight'] + user_data['quick_hitch_weight']
-            new_total_load = optimal_bucket['total_bucket_weight']  # Corrected variable
-
-            # Adjust payload for the new bucket using the function
-            dump_truck_payload_new, swings_to_fill_truck_new = adjust_payload_for_new_bucket(dump_truck_payload, new_payload)
-            dump_truck_payload_old, swings_to_fill_truck_old = adjust_payload_for_old_bucket(dump_truck_payload, old_payload)
-    
-            # Time to fill truck in minutes
-            time_to_fill_truck_old = swings_to_fill_truck_old / machine_swings_per_minute
-            time_to_fill_truck_new = swings_to_fill_truck_new / machine_swings_per_minute
-    
-            # Average number of trucks per hour at 75% efficiency
-            avg_trucks_per_hour_old = (60 / time_to_fill_truck_old) * 0.75 if time_to_fill_truck_old > 0 else 0
-            avg_trucks_per_hour_new = (60 / time_to_fill_truck_new) * 0.75 if time_to_fill_truck_new > 0 else 0
-    
-            # Swings per hour
-            swings_per_hour_old = swings_to_fill_truck_old * avg_trucks_per_hour_old
-            swings_per_hour_new = swings_to_fill_truck_new * avg_trucks_per_hour_new
-    
-            # Total swings per hour
-            total_swings_per_hour = 60 * machine_swings_per_minute
-
-            # Truck Tonnes per hour
-            truck_tonnage_per_hour_old = swings_per_hour_old * old_capacity * user_data['material_density'] / 1000
-            truck_tonnage_per_hour_new = swings_per_hour_new * new_capacity * user_data['material_density'] / 1000
-    
-            # Production (t/hr)
-            total_tonnage_per_hour_old = total_swings_per_hour * old_capacity * user_data['material_density'] / 1000
-            total_tonnage_per_hour_new = total_swings_per_hour * new_capacity * user_data['material_density'] / 1000
-    
-            # Production (t/hr)
-            tonnage_per_hour_old = avg_trucks_per_hour_old * dump_truck_payload_old / 1000
-            tonnage_per_hour_new = avg_trucks_per_hour_new * dump_truck_payload_new / 1000
-    
-            # Assuming 1800 swings in a day
-            total_m3_per_day_old = 1000 * old_capacity
-            total_m3_per_day_new = 1000 * new_capacity
-    
-            # Total tonnage per day
-            total_tonnage_per_day_old = total_m3_per_day_old * user_data['material_density'] / 1000
-            total_tonnage_per_day_new = total_m3_per_day_new * user_data['material_density'] / 1000
-    
-            # Total number of trucks per day
-            total_trucks_per_day_old = total_tonnage_per_day_old / dump_truck_payload * 1000
-            total_trucks_per_day_new = total_tonnage_per_day_new / dump_truck_payload * 1000
-
-            Productivity = f"{(1.1 * total_tonnage_per_hour_new - total_tonnage_per_hour_old) / total_tonnage_per_hour_old * 100:.0f}%"
-
-            st.success(f"Great news! ONTRAC could improve your productivity by up to {Productivity}!")
-            st.success(f"Your ONTRAC XMOR® Bucket Solution is the: {optimal_bucket['bucket_name']} ({optimal_bucket['bucket_size']} m³)")
-            # Load and display images from a local directory
-            XMOR_IMAGE = Image.open('XMOR_BHC_IMAGE.png') if select_bhc else Image.open('XMOR_BHB_IMAGE.png')
-
-            # Show images
-            st.image([XMOR_IMAGE], caption=[f"{optimal_bucket['bucket_name']} ({optimal_bucket['bucket_size']} m³)"], width=400)
-    
-            # Side-by-Side Bucket Comparison Data
-            side_by_side_data = {
-                'Description': [
-                     'Capacity (m³)', 'Material Density (kg/m³)', 'Bucket Payload (kg)', 
-                    'Total Suspended Load (kg)'
-                ],
-                'Old Bucket': [
-                     f"{old_capacity:.1f}", f"{user_data['material_density']:.0f}", f"{old_payload:.0f}", 
-                    f"{old_total_load:.0f}"
-                ],
-                'XMOR® Bucket': [
-                     f"{new_capacity:.1f}", f"{user_data['material_density']:.0f}", f"{new_payload:.0f}", 
-                    f"{new_total_load:.0f}"
-                ],
-                'Difference': [
-                     f"{new_capacity - old_capacity:.1f}", '-', f"{new_payload - old_payload:.0f}", 
-                    f"{new_total_load - old_total_load:.0f}"
-                ],
-                '% Difference': [
-                     f"{(new_capacity - old_capacity) / old_capacity * 100:.0f}%", '-', f"{(new_payload - old_payload) / old_payload * 100:.0f}%", 
-                    f"{(new_total_load - old_total_load) / old_total_load * 100:.0f}%"
-                ]
-            }
-            
-            # Loadout Productivity & Truck Pass Simulation Data
-            loadout_productivity_data = {
-                'Description': [
-                     f"{truck_brand} {truck_model} Payload (kg)", 'Avg No. Swings to Fill Truck', 
-                    'Time to Fill Truck (min)', 'Avg Trucks/Hour @ 75% eff', 'Swings/Hour', 'Tonnes/Hour'
-                ],
-                'Old Bucket': [
-                     f"{dump_truck_payload_old:.0f}{'*' if dump_truck_payload_old != dump_truck_payload else ''}", f"{swings_to_fill_truck_old:.1f}", 
-                    f"{time_to_fill_truck_old:.1f}", f"{avg_trucks_per_hour_old:.1f}", f"{swings_per_hour_old:.0f}", f"{truck_tonnage_per_hour_old:.0f}"
-                ],
-                'XMOR® Bucket': [
-                     f"{dump_truck_payload_new:.0f}{'*' if dump_truck_payload_new != dump_truck_payload else ''}", f"{swings_to_fill_truck_new:.1f}", 
-                    f"{time_to_fill_truck_new:.1f}", f"{avg_trucks_per_hour_new:.1f}", f"{swings_per_hour_new:.0f}", f"{truck_tonnage_per_hour_new:.0f}"
-                ],
-                'Difference': [
-                     f"{dump_truck_payload_new - dump_truck_payload_old:.0f}", f"{swings_to_fill_truck_new - swings_to_fill_truck_old:.1f}", 
-                    f"{time_to_fill_truck_new - time_to_fill_truck_old:.1f}", f"{avg_trucks_per_hour_new - avg_trucks_per_hour_old:.1f}",
-                    "-", f"{truck_tonnage_per_hour_new - truck_tonnage_per_hour_old:.0f}"
-                ],
-                '% Difference': [
-                     f"{(dump_truck_payload_new - dump_truck_payload_old) / dump_truck_payload_old * 100:.0f}%", 
-                    f"{(swings_to_fill_truck_new - swings_to_fill_truck_old) / swings_to_fill_truck_old * 100:.0f}%",
-                    f"{(time_to_fill_truck_new - time_to_fill_truck_old) / time_to_fill_truck_old * 100:.0f}%",
-                    f"{(avg_trucks_per_hour_new - avg_trucks_per_hour_old) / avg_trucks_per_hour_old * 100:.0f}%",
-                    "-",
-                    f"{(truck_tonnage_per_hour_new - truck_tonnage_per_hour_old) / truck_tonnage_per_hour_old * 100:.0f}%"
-                ]
-            }
-            
-            # 1000 Swings Side-by-Side Simulation Data
-            swings_simulation_data = {
-                'Description': [
-                     'Number of Swings', 'Total Volume (m³)', 
-                    'Total Tonnes', 'Total Trucks'
-                ],
-                'Old Bucket': [
-                    '1000', f"{total_m3_per_day_old:.0f}", f"{total_tonnage_per_day_old:.0f}", 
-                    f"{total_trucks_per_day_old:.0f}"
-                ],
-                'XMOR® Bucket': [
-                    '1000', f"{total_m3_per_day_new:.0f}", f"{total_tonnage_per_day_new:.0f}", 
-                    f"{total_trucks_per_day_new:.0f}"
-                ],
-                'Difference': [
-                    '-', f"{total_m3_per_day_new - total_m3_per_day_old:.0f}", 
-                    f"{total_tonnage_per_day_new - total_tonnage_per_day_old:.0f}", 
-                    f"{total_trucks_per_day_new - total_trucks_per_day_old:.0f}"
-                ],
-                '% Difference': [
-                    '-', f"{(total_m3_per_day_new - total_m3_per_day_old) / total_m3_per_day_old * 100:.0f}%", 
-                    f"{(total_tonnage_per_day_new - total_tonnage_per_day_old) / total_tonnage_per_day_old * 100:.0f}%", 
-                    f"{(total_trucks_per_day_new - total_trucks_per_day_old) / total_trucks_per_day_old * 100:.0f}%"
-                ]
-            }
-            
-            # 10% Improved Cycle Time Simulation Data
-            improved_cycle_data = {
-                'Description': [
-                     'Number of Swings', 'Total Volume (m³)', 
-                    'Total Tonnes', 'Total Trucks'
-                ],
-                'Old Bucket': [
-                    '1000', f"{total_m3_per_day_old:.0f}", f"{total_tonnage_per_day_old:.0f}", 
-                    f"{total_trucks_per_day_old:.0f}"
-                ],
-                'XMOR® Bucket': [
-                    '1100', f"{1.1 * total_m3_per_day_new:.0f}", f"{1.1 * total_tonnage_per_day_new:.0f}", 
-                    f"{1.1 * total_trucks_per_day_new:.0f}"
-                ],
-                'Difference': [
-                    '100', f"{1.1 * total_m3_per_day_new - total_m3_per_day_old:.0f}", 
-                    f"{1.1 * total_tonnage_per_day_new - total_tonnage_per_day_old:.0f}", 
-                    f"{1.1 * total_trucks_per_day_new - total_trucks_per_day_old:.0f}"
-                ],
-                '% Difference': [
-                    '10%', f"{(1.1 * total_m3_per_day_new - total_m3_per_day_old) / total_m3_per_day_old * 100:.0f}%", 
-                    f"{(1.1 * total_tonnage_per_day_new - total_tonnage_per_day_old) / total_tonnage_per_day_old * 100:.0f}%", 
-                    f"{(1.1 * total_trucks_per_day_new - total_trucks_per_day_old) / total_trucks_per_day_old * 100:.0f}%"
-                ]
-            }
-            
-            # Function to add a title row
-            def add_section_title(title, data):
-                # Create a DataFrame with the title row
-                title_row = pd.DataFrame([[title] + [''] * (len(data.columns) - 1)], columns=data.columns)
-                # Concatenate title row and the data
-                return pd.concat([title_row, data], ignore_index=True)
-            
-            # Example DataFrames for each section
-            side_by_side_df = pd.DataFrame(side_by_side_data)
-            loadout_productivity_df = pd.DataFrame(loadout_productivity_data)
-            swings_simulation_df = pd.DataFrame(swings_simulation_data)
-            improved_cycle_df = pd.DataFrame(improved_cycle_data)
-            
-            # Adding section headers
-            side_by_side_with_title = add_section_title("Side-by-Side Bucket Comparison", side_by_side_df)
-            loadout_productivity_with_title = add_section_title("Loadout Productivity & Truck Pass Simulation", loadout_productivity_df)
-            swings_simulation_with_title = add_section_title("1000 Swings Side-by-Side Simulation", swings_simulation_df)
-            improved_cycle_with_title = add_section_title("10% Improved Cycle Time Simulation", improved_cycle_df)
-            
-            # Combine all sections into one DataFrame
-            final_df = pd.concat([
-                side_by_side_with_title,
-                loadout_productivity_with_title,
-                swings_simulation_with_title,
-                improved_cycle_with_title
-            ], ignore_index=True)
-
-            # Create a Pandas Excel writer
-            excel_file = BytesIO()
-            
-            with pd.ExcelWriter(excel_file, engine='xlsxwriter') as writer:
-                # Write the final DataFrame to the Excel writer
-                final_df.to_excel(writer, sheet_name='Excavator Simulation Data', index=False)
-            
-            # Rewind the buffer to the beginning so it can be read
-            excel_file.seek(0)
-            
-            if final_df is not None:
-                st.title('XMOR® Productivity Comparison')
-            
-                # Call the function for each table with the appropriate title
-                st.markdown(generate_html_table(side_by_side_data, "Side-by-Side Bucket Comparison"), unsafe_allow_html=True)
-                st.markdown(generate_html_table(loadout_productivity_data, "Loadout Productivity & Truck Pass Simulation"), unsafe_allow_html=True)
-                st.markdown(generate_html_table(swings_simulation_data, "1000 Swings Side-by-Side Simulation"), unsafe_allow_html=True)
-                st.markdown(generate_html_table(improved_cycle_data, "10% Improved Cycle Time Simulation"), unsafe_allow_html=True)
-            
-                # Optional notes about dump truck fill factor
-                if dump_truck_payload_new != dump_truck_payload:
-                    st.write(f"*Dump Truck fill factor of {(100 * dump_truck_payload_new / dump_truck_payload):.1f}% applied for XMOR® Bucket pass matching.")
-                if dump_truck_payload_old != dump_truck_payload:
-                    st.write(f"*Dump Truck fill factor of {(100 * dump_truck_payload_old / dump_truck_payload):.1f}% applied for Old Bucket pass matching.")
-            
-                # Add a download button for the Excel file
-                st.download_button(
-                    label="Download Results In Excel",
-                    data=excel_file,
-                    file_name="productivity_study.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
-                
-                # Provide additional details for calculations
-                st.write(f"Total Suspended Load (XMOR® Bucket): {optimal_bucket['total_bucket_weight']:.0f}kg")
-                st.write(f"Safe Working Load at {user_data['reach']}m reach ({user_data['make']} {user_data['model']}): {swl:.0f}kg")
-                st.write(f"Calculations based on the {user_data['make']} {user_data['model']} with a {user_data['boom_length']}m boom, {user_data['arm_length']}m arm, {user_data['cwt']}kg counterweight, {user_data['shoe_width']}mm shoes, operating at a reach of {user_data['reach']}m, and with a material density of {user_data['material_density']:.0f}kg/m³.")
-                st.write(f"Dump Truck: {truck_brand} {truck_model}, Rated payload = {user_data['dump_truck_payload'] * 1000:.0f}kg")
-        else:
-            st.write("No suitable bucket found within SWL limits.")
-    else:
+    study_inputs = StudyInputs(**user_data, select_bhc=select_bhc, truck_brand=truck_brand, truck_model=truck_model)
+    try:
+        result = compute_study(study_inputs, catalog)
+    except ValueError as e:
+        st.error(str(e))
+        result = None
+
+    if result is None:
+        pass
+    elif result.status == NO_MATCHING_CONFIGURATION:
         st.write("No matching excavator configuration found!")
+    elif result.status == NO_SUITABLE_BUCKET:
+        st.write("No suitable bucket found within SWL limits.")
+    else:
+        swl = result.swl
+        optimal_bucket = result.optimal_bucket
+        dump_truck_payload = user_data['dump_truck_payload'] * 1000
+        dump_truck_payload_new = result.new.truck_payload
+        dump_truck_payload_old = result.old.truck_payload
+
+        st.success(f"Great news! ONTRAC could improve your productivity by up to {result.productivity_text}!")
+        st.success(f"Your ONTRAC XMOR® Bucket Solution is the: {optimal_bucket.bucket_name} ({optimal_bucket.bucket_size} m³)")
+        # Show the bucket image, decoded and sized once per process by the image cache
+        XMOR_IMAGE = bucket_image(optimal_bucket.bucket_name, 'BHC' if select_bhc else 'BHB', width=400)
+        st.image([XMOR_IMAGE], caption=[f"{optimal_bucket.bucket_name} ({optimal_bucket.bucket_size} m³)"], width=400)
+
+        st.title('XMOR® Productivity Comparison')
+
+        # Call the function for each table with the appropriate title
+        for title, table in result.tables.items():
+            st.markdown(generate_html_table(table, title), unsafe_allow_html=True)
+
+        if simulate_variability:
+            simulation = simulate_study(
+                study_inputs,
+                density=spread(user_data['material_density'], density_variation / 100),
+                swing_rate=spread(user_data['machine_swings_per_minute'], swing_rate_variation / 100),
+                efficiency=uniform(*efficiency_range),
+                cycle_factor=uniform(*cycle_factor_range),
+                catalog=catalog,
+            )
+            if simulation.ok:
+                st.markdown(generate_html_table(simulation.summary_table(),
+                                                f"Site Variability Simulation ({simulation.draws:,} draws)"),
+                            unsafe_allow_html=True)
+                st.write("XMOR® Bucket picked: " + ", ".join(
+                    f"{name} {share:.0%}" for name, share in simulation.bucket_shares.items())
+                    + (f", none fits {simulation.no_bucket_share:.0%}" if simulation.no_bucket_share else ""))
+
+        if simulate_fleet:
+            shift = simulate_loadout(study_inputs, fleet_size=int(fleet_size), haul_minutes=haul_minutes,
+                                     catalog=catalog)
+            st.markdown(generate_html_table(shift.comparison_table(),
+                                            f"12-Hour Shift Simulation ({int(fleet_size)} Trucks)"),
+                        unsafe_allow_html=True)
+
+        # Optional notes about dump truck fill factor
+        if dump_truck_payload_new != dump_truck_payload:
+            st.write(f"*Dump Truck fill factor of {(100 * dump_truck_payload_new / dump_truck_payload):.1f}% applied for XMOR® Bucket pass matching.")
+        if dump_truck_payload_old != dump_truck_payload:
+            st.write(f"*Dump Truck fill factor of {(100 * dump_truck_payload_old / dump_truck_payload):.1f}% applied for Old Bucket pass matching.")
+
+        # Add a download button for the Excel file; the workbook is only built when it is clicked,
+        # and clicking it doesn't rerun the page
+        st.download_button(
+            label="Download Results In Excel",
+            data=partial(study_workbook, result),
+            file_name="productivity_study.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            on_click="ignore"
+        )
+
+        # Provide additional details for calculations
+        st.write(f"Total Suspended Load (XMOR® Bucket): {optimal_bucket.total_bucket_weight:.0f}kg")
+        st.write(f"Safe Working Load at {user_data['reach']}m reach ({user_data['make']} {user_data['model']}): {swl:.0f}kg")
+        st.write(f"Calculations based on the {user_data['make']} {user_data['model']} with a {user_data['boom_length']}m boom, {user_data['arm_length']}m arm, {user_data['cwt']}kg counterweight, {user_data['shoe_width']}mm shoes, operating at a reach of {user_data['reach']}m, and with a material density of {user_data['material_density']:.0f}kg/m³.")
+        st.write(f"Dump Truck: {truck_brand} {truck_model}, Rated payload = {user_data['dump_truck_payload'] * 1000:.0f}kg")
+
+    if rank_combinations and result is not None:
+        ranked = rank_matches(study_inputs, catalog=catalog)
+        if len(ranked):
+            st.markdown(generate_html_table(ranking_table(ranked), "Top Truck & Bucket Combinations"),
+                        unsafe_allow_html=True)
+        elif len(rank_matches(study_inputs, top_k=1, min_passes=None, max_passes=None, catalog=catalog)):
+            # Combinations exist, but none loads a truck in the ranked pass range
+            st.write(f"No truck and bucket combination loads a truck in {MIN_PASSES} to {MAX_PASSES} passes "
+                     "for this configuration.")
+        else:
+            st.write("No truck and bucket combination fits this configuration.")
+
+    if sweep_reach and result is not None:
+        sweep = sweep_reaches(study_inputs, step=None if reach_step == "Chart reaches" else reach_step,
+                              catalog=catalog)
+        if len(sweep):
+            st.markdown(generate_html_table(sweep_table(sweep), "XMOR® Bucket Across Reach"),
+                        unsafe_allow_html=True)
+            st.line_chart(sweep.set_index('reach')[['swl', 'total_bucket_weight']]
+                          .rename(columns={'swl': 'Safe Working Load (kg)',
+                                           'total_bucket_weight': 'Total Suspended Load (kg)'}))
+        else:
+            st.write("No load chart found for this configuration.")
 else:
     st.write("Please select options and press 'Calculate' to proceed.")
+
+if compare_fleet and fleet_file is not None:
+    progress_bar = st.progress(0.0, text="Comparing fleet...")
+    try:
+        fleet_results, fleet_issues = study_fleet(
+            fleet_file.getvalue(), fleet_file.name, material_density, catalog,
+            progress=lambda done, total: progress_bar.progress(done / total, text=f"Compared {done:,} of {total:,} machines"))
+    except ValueError as e:
+        st.error(str(e))
+        fleet_results = None
+    progress_bar.empty()
+
+    if fleet_results is not None:
+        st.title('XMOR® Site Fleet Comparison')
+        st.markdown(generate_html_table(site_table(site_totals(fleet_results)), f"Site Totals ({html.escape(fleet_file.name)})"),
+                    unsafe_allow_html=True)
+        problem_rows = int((fleet_issues != '').sum())
+        if problem_rows:
+            st.warning(f"{problem_rows:,} of {len(fleet_issues):,} rows have problems; see the Issues column.")
+        st.dataframe(fleet_table(fleet_results, fleet_issues), hide_index=True)
+        st.download_button(
+            label="Download Fleet Results (CSV)",
+            data=fleet_results.to_csv(index=False),
+            file_name="fleet_comparison.csv",
+            mime="text/csv",
+            on_click="ignore"
+        )
+
+# Per-rerun timing breakdown, shown with ?timing=1 in the URL while timing is enabled
+timing.finish_run(rerun)
+if rerun is not None and st.query_params.get('timing'):
+    with st.expander("Timing for this rerun"):
+        st.table(rerun.breakdown())
     
 
 # Run the Streamlit app
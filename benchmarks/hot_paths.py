@@ -0,0 +1,237 @@
+"""
+Micro-benchmarks for every hot path, on synthetic catalogs scaled from the shipped CSVs.
+
+    python benchmarks/hot_paths.py                          # 1x, 100x and 10000x
+    python benchmarks/hot_paths.py --scales 1,100 -o before.json
+    python benchmarks/hot_paths.py --compare before.json after.json
+
+A scale of N writes a catalog with N renamed copies of every machine
+configuration, bucket and truck to a temporary directory, so the selector
+index, SWL index, bucket tables and truck list all grow N-fold. 10000x is
+about 7.9M load-chart rows and needs several GB of RAM and a few minutes.
+
+Results go to a JSON file (with the git commit and library versions) so runs
+from different commits can be compared with --compare.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from xmor.catalog import DATASETS, Catalog  # noqa: E402
+from xmor.compiled import compile_catalog  # noqa: E402
+from xmor.core import (StudyInputs, compute_study, compute_studies, find_carrying_configurations,  # noqa: E402
+                       sweep_reaches)
+from xmor.engine import match_passes, select_optimal_buckets  # noqa: E402
+from xmor.fleet import run_fleet, validate_fleet  # noqa: E402
+from xmor.index import CONFIG_LEVELS, ReachIndex, SelectorIndex, SWLIndex  # noqa: E402
+from xmor.memo import clear_caches  # noqa: E402
+from xmor.montecarlo import simulate_study, spread, uniform  # noqa: E402
+from xmor.render import generate_html_table  # noqa: E402
+from xmor.report import study_workbook  # noqa: E402
+from xmor.simulation import simulate_shift  # noqa: E402
+
+# Each benchmark is repeated until it has run this long (or MAX_REPEATS times)
+MIN_TIME = 0.5
+MAX_REPEATS = 10_000
+
+
+def write_scaled_catalog(directory, scale):
+    """Write the four CSVs with ``scale`` renamed copies of every row."""
+    def replicate(frame, column):
+        if scale == 1:
+            return frame
+        copies = [frame.assign(**{column: frame[column].astype(str) + f"-S{copy}"}) for copy in range(scale)]
+        return pd.concat(copies, ignore_index=True)
+
+    for name, (file_name, _) in DATASETS.items():
+        frame = pd.read_csv(os.path.join(ROOT, file_name), dtype=str, keep_default_na=False)
+        column = {'swl': 'model', 'bucket': 'bucket_name', 'bhc_bucket': 'bucket_name', 'dump_truck': 'model'}[name]
+        replicate(frame, column).to_csv(os.path.join(directory, file_name), index=False)
+
+
+def measure(function, min_time=MIN_TIME, max_repeats=MAX_REPEATS):
+    """Per-call wall times in seconds."""
+    times = []
+    started = time.perf_counter()
+    while len(times) < max_repeats and (not times or time.perf_counter() - started < min_time):
+        call_started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - call_started)
+    return times
+
+
+def summarize(times, items=1):
+    return {
+        'repeats': len(times),
+        'min_s': min(times),
+        'median_s': statistics.median(times),
+        'mean_s': statistics.fmean(times),
+        'p95_s': sorted(times)[int(0.95 * (len(times) - 1))],
+        'items_per_s': items / statistics.median(times) if statistics.median(times) else None,
+    }
+
+
+def run_scale(scale, directory):
+    """Benchmarks at one catalog scale, as {name: summary}."""
+    results = {}
+
+    def bench(name, function, items=1, **options):
+        results[name] = summarize(measure(function, **options), items)
+        print(f"  {name:<36} {results[name]['median_s'] * 1e3:12.3f} ms", file=sys.stderr)
+
+    heavy = dict(min_time=0, max_repeats=3) if scale >= 100 else {}
+
+    # Catalog loading: parsing the CSVs (no compiled copy exists yet), then memory-mapping the compiled copy
+    uncompiled = os.path.join(directory, 'not-compiled')
+    bench('catalog_load_csv', lambda: [Catalog(directory, compiled_dir=uncompiled).get(name) for name in DATASETS],
+          **heavy)
+    compile_catalog(Catalog(directory, compiled_dir=uncompiled), os.path.join(directory, 'compiled'))
+    bench('catalog_load_compiled', lambda: [Catalog(directory).get(name) for name in DATASETS], **heavy)
+
+    catalog = Catalog(directory)
+    swl_data = catalog.swl_data
+    bench('selector_index_build', lambda: SelectorIndex(swl_data), **heavy)
+    bench('swl_index_build', lambda: SWLIndex(swl_data), **heavy)
+
+    # Selector cascade: options for all seven levels along the first configuration's path
+    selector = catalog.selector_index
+    row = swl_data.iloc[0]
+    path = [row[level] for level in ('make', 'model', 'boom_length', 'arm_length', 'CWT', 'shoe_width')]
+    bench('selector_cascade', lambda: [selector.options(*path[:depth]) for depth in range(7)])
+
+    swl_index = catalog.swl_index
+    config = tuple(row[level] for level in CONFIG_LEVELS)
+    config = tuple(value.item() if hasattr(value, 'item') else value for value in config)
+    bench('find_matching_swl', lambda: swl_index.lookup(config, float(row['reach'])))
+    reaches = np.linspace(2, 12, 10_000)
+    bench('swl_interpolate_10k_reaches', lambda: swl_index.interpolate(config, reaches), items=len(reaches))
+
+    bench('reach_index_build', lambda: ReachIndex(swl_data), **heavy)
+    reach_index = catalog.reach_index
+    bench('reach_index_carriers', lambda: reach_index.carriers(12000.0, 50))
+
+    buckets = catalog.bucket_table
+    bench('select_optimal_bucket', lambda: select_optimal_buckets(buckets, 12600.0, 1800.0, 1200.0, 50))
+    rng = np.random.default_rng(0)
+    swl = rng.uniform(5000, 40000, 10_000)
+    density = rng.uniform(1200, 2400, 10_000)
+    bench('select_optimal_bucket_10k', lambda: select_optimal_buckets(buckets, swl, density, 1200.0, 70),
+          items=len(swl), **heavy)
+
+    # The trucks x buckets grid is capped at about 1M pairs so it fits in memory at every scale
+    trucks = catalog.dump_truck_data['payload'].to_numpy(dtype=float)[:100] * 1000
+    bucket_payloads = buckets.bucket_size[:10_000] * 1800.0
+    bench('match_passes', lambda: match_passes(40000.0, 7380.0))
+    bench('match_passes_trucks_x_buckets', lambda: match_passes(trucks[:, None], bucket_payloads[None, :]),
+          items=len(trucks) * len(bucket_payloads), **heavy)
+
+    inputs = StudyInputs(str(row['make']), str(row['model']), *config[2:], float(row['reach']),
+                         material_density=1800.0, quick_hitch_weight=1200.0, current_bucket_size=2.8,
+                         current_bucket_weight=2500.0, dump_truck_payload=40.0, machine_swings_per_minute=3.0,
+                         truck_brand='Komatsu', truck_model='HM400-5')
+    # Stage caches are cleared inside the timed call so the full pipeline is measured, not a memo hit;
+    # a scaled catalog is never the process-wide one, so the persistent result store isn't consulted
+    bench('compute_study', lambda: (clear_caches(), compute_study(inputs, catalog)))
+    bench('compute_study_cached', lambda: compute_study(inputs, catalog))
+    bench('find_carrying_configurations',
+          lambda: find_carrying_configurations(str(buckets.bucket_name[0]), 1800.0, 1200.0, catalog))
+    bench('sweep_reaches_chart', lambda: sweep_reaches(inputs, catalog=catalog))
+    bench('sweep_reaches_0.05m', lambda: sweep_reaches(inputs, step=0.05, catalog=catalog))
+    scenarios = pd.DataFrame([inputs.to_user_data()] * 10_000)
+    bench('compute_studies_10k', lambda: compute_studies(scenarios, catalog), items=len(scenarios))
+    fleet = scenarios.head(5000)
+    bench('fleet_validate_and_run_5k', lambda: run_fleet(validate_fleet(fleet, catalog=catalog)[0], catalog),
+          items=len(fleet))
+
+    variability = dict(density=spread(1800.0, 0.15), swing_rate=spread(3.0, 0.2),
+                       efficiency=uniform(0.65, 0.85), cycle_factor=uniform(1.05, 1.15))
+    bench('monte_carlo_20k_draws', lambda: simulate_study(inputs, **variability, seed=0, catalog=catalog),
+          items=20_000)
+
+    bench('shift_simulation_8_trucks', lambda: simulate_shift(4.1, 1800.0, [40000.0] * 8, 3.0))
+
+    result = compute_study(inputs, catalog)
+    if result.ok:
+        bench('generate_html_table_x4',
+              lambda: [generate_html_table(table, title) for title, table in result.tables.items()])
+        bench('excel_export', lambda: (clear_caches(), study_workbook(result)))
+        bench('excel_export_cached', lambda: study_workbook(result))
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(before_path, after_path):
+    """Print median time ratios (after / before) for benchmarks present in both files."""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before['environment']['commit']} -> {after['environment']['commit']}")
+    for scale, benchmarks in after['results'].items():
+        for name, summary in benchmarks.items():
+            old = before['results'].get(scale, {}).get(name)
+            if old:
+                ratio = summary['median_s'] / old['median_s']
+                flag = '  REGRESSION' if ratio > 1.2 else ''
+                print(f"{scale:>7}x {name:<36} {old['median_s'] * 1e3:10.3f} -> "
+                      f"{summary['median_s'] * 1e3:10.3f} ms  x{ratio:.2f}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', default='1,100,10000', help="Comma-separated catalog scale factors")
+    parser.add_argument('-o', '--output', default='bench_results.json', help="JSON results file")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help="Compare two results files")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = {'environment': environment(), 'results': {}}
+    for scale in (int(value) for value in args.scales.split(',')):
+        print(f"scale {scale}x", file=sys.stderr)
+        directory = tempfile.mkdtemp(prefix=f'xmor-bench-{scale}x-')
+        try:
+            write_scaled_catalog(directory, scale)
+            report['results'][str(scale)] = run_scale(scale, directory)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(f"results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
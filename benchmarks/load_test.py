@@ -0,0 +1,335 @@
+"""
+Concurrent-session load test for the Streamlit page, driven headlessly through AppTest.
+
+    python benchmarks/load_test.py                          # 1, 4 and 16 sessions
+    python benchmarks/load_test.py --sessions 8,32 --rounds 5 -o after.json
+    python benchmarks/load_test.py --compare before.json after.json
+
+Each session is its own AppTest (its own session state and script runs) on
+its own thread, all in one process, the way one Streamlit server serves its
+users: they share the catalog and the xmor caches and contend for the same
+GIL. A round walks the selector cascade one selectbox at a time (each pick
+is a rerun, as in a browser) with random choices, picks a truck, enters a
+random density and the bucket figures, and presses Calculate. Sessions start
+together and pause ``--think`` seconds between steps. One unmeasured session
+runs first, so loading the catalog isn't counted against the first level.
+
+For each session count the report has per-rerun latency percentiles (all
+reruns, and by kind: cascade picks, inputs, Calculate), reruns and
+Calculates per second, the process's resident memory growth over the level
+(shared caches included), any script exceptions, and the xmor stage cache
+hit counts. With --trace-memory it also has the memory each session holds:
+allocations are traced through the level, and what is freed once its
+sessions are dropped, divided by their number, is the per-session figure.
+Tracing slows every allocation, so latencies from such a run aren't
+comparable with untraced ones. Results go to a JSON file alongside
+hot_paths.py's, and --compare prints two runs side by side. Set
+XMOR_RESULT_STORE=off to measure without the persistent result store.
+
+AppTest isn't built for overlapping runs; see shared_runtime for what is
+patched to allow them, for the duration of the test only. Those are
+Streamlit internals, checked against TESTED_STREAMLIT.
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from unittest.mock import MagicMock  # noqa: E402
+
+import streamlit  # noqa: E402
+from streamlit import config  # noqa: E402
+from streamlit.runtime import Runtime  # noqa: E402
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager  # noqa: E402
+from streamlit.runtime.dataframe_source_manager import DataframeSourceManager  # noqa: E402
+from streamlit.runtime.media_file_manager import MediaFileManager  # noqa: E402
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage  # noqa: E402
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+from streamlit.testing.v1.util import build_mock_config_get_option  # noqa: E402
+
+from hot_paths import environment  # noqa: E402
+from xmor.memo import cache_info  # noqa: E402
+
+PAGE = os.path.join(ROOT, 'Ez6060.py')
+
+# Selectboxes on the page: seven cascade levels, then truck brand, type, model and payload
+CASCADE_SELECTBOXES = 7
+TRUCK_SELECTBOXES = (7, 8, 9)
+
+PERCENTILES = (50, 90, 95, 99)
+
+# Streamlit releases whose AppTest and Runtime internals shared_runtime has been checked against
+TESTED_STREAMLIT = ('1.65.',)
+
+
+def rss_bytes():
+    """Resident set size of this process, or None where /proc isn't available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+@contextlib.contextmanager
+def shared_runtime():
+    """
+    Let AppTest runs overlap for the duration of the block.
+
+    Each AppTest run installs a mock Runtime singleton and an appTest config
+    override, and removes both when it finishes, which assumes one run at a
+    time: a session finishing mid-way through another's run would pull the
+    Runtime out from under it. Here a shared mock Runtime stands in whenever
+    no run has one installed, and the override is in place for the whole
+    test, so whatever a finishing run restores is still valid.
+
+    Each run also compiles the page afresh. Parsing from several threads at
+    once trips CPython 3.11's AST recursion check, and a real server compiles
+    once and keeps the bytecode, so compiled pages are shared as well.
+
+    Everything patched is put back when the block exits.
+    """
+    if not streamlit.__version__.startswith(TESTED_STREAMLIT):
+        print(f"warning: load test written against Streamlit {', '.join(TESTED_STREAMLIT)}x, "
+              f"running {streamlit.__version__}; its AppTest internals may have changed", file=sys.stderr)
+    saved_runtime = Runtime.__dict__['instance'], Runtime.__dict__['exists']
+    saved_get_option = config.get_option
+    saved_get_bytecode = ScriptCache.get_bytecode
+
+    shared = MagicMock(spec=Runtime)
+    shared.media_file_mgr = MediaFileManager(MemoryMediaFileStorage('/mock/media'))
+    shared.dataframe_source_mgr = DataframeSourceManager()
+    shared.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: cls._instance or shared)
+    Runtime.exists = classmethod(lambda cls: True)
+    config.get_option = build_mock_config_get_option({'global.appTest': True})
+
+    compiled = {}
+    compile_lock = threading.Lock()
+
+    def shared_bytecode(self, script_path):
+        with compile_lock:
+            if script_path not in compiled:
+                compiled[script_path] = saved_get_bytecode(self, script_path)
+            return compiled[script_path]
+
+    ScriptCache.get_bytecode = shared_bytecode
+    try:
+        yield
+    finally:
+        Runtime.instance, Runtime.exists = saved_runtime
+        config.get_option = saved_get_option
+        ScriptCache.get_bytecode = saved_get_bytecode
+
+
+class Session:
+    """One simulated user: an AppTest plus the latency of every rerun it triggered."""
+
+    def __init__(self, number, seed, timeout):
+        self.number = number
+        self.rng = random.Random(seed * 100_003 + number)
+        self.app = AppTest.from_file(PAGE, default_timeout=timeout)
+        self.latencies = []
+        self.exceptions = []
+        # Calculates that found a bucket, as opposed to no configuration or no suitable bucket
+        self.studies = 0
+
+    def _run(self, kind):
+        started = time.perf_counter()
+        self.app.run()
+        self.latencies.append((kind, time.perf_counter() - started))
+        for exception in self.app.exception:
+            self.exceptions.append(f"{kind}: {exception.message}")
+
+    def _pick(self, position, kind):
+        selectbox = self.app.selectbox[position]
+        if selectbox.options:
+            selectbox.select_index(self.rng.randrange(len(selectbox.options)))
+            self._run(kind)
+
+    def start(self):
+        self._run('start')
+
+    def round(self, think):
+        for level in range(CASCADE_SELECTBOXES):
+            self._pick(level, 'cascade')
+            time.sleep(think)
+        for position in TRUCK_SELECTBOXES:
+            self._pick(position, 'truck')
+            time.sleep(think)
+
+        inputs = self.app.number_input
+        inputs[0].set_value(float(self.rng.randrange(1200, 2450, 50)))
+        inputs[-3].set_value(self.rng.choice((1.5, 2.0, 2.8, 3.5)))
+        inputs[-2].set_value(2500.0)
+        inputs[-1].set_value(self.rng.choice((2.5, 3.0, 3.5)))
+        self._run('inputs')
+        time.sleep(think)
+
+        self.app.button[0].click()
+        self._run('calculate')
+        self.studies += bool(self.app.success)
+        time.sleep(think)
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    ordered = sorted(values)
+    summary = {f'p{p}_s': ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] for p in PERCENTILES}
+    summary.update(mean_s=statistics.fmean(ordered), max_s=ordered[-1], count=len(ordered))
+    return summary
+
+
+def run_level(sessions, rounds, think, seed, timeout, trace_memory=False):
+    """Load test with ``sessions`` concurrent sessions, as a summary dict."""
+    if trace_memory:
+        gc.collect()
+        tracemalloc.start()
+    users = [Session(number, seed, timeout) for number in range(sessions)]
+    rss_before = rss_bytes()
+    cache_before = cache_info()
+    barrier = threading.Barrier(sessions)
+    errors = []
+
+    def drive(user):
+        try:
+            barrier.wait()
+            user.start()
+            for _ in range(rounds):
+                user.round(think)
+        except Exception as e:
+            errors.append(f"session {user.number}: {type(e).__name__}: {e} (after {len(user.latencies)} reruns)")
+
+    threads = [threading.Thread(target=drive, args=(user,), name=f'session-{user.number}') for user in users]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    rss_after = rss_bytes()
+
+    latencies = [entry for user in users for entry in user.latencies]
+    by_kind = {}
+    for kind, seconds in latencies:
+        by_kind.setdefault(kind, []).append(seconds)
+    calculates = len(by_kind.get('calculate', ()))
+    cache_after = cache_info()
+    summary = {
+        'sessions': sessions,
+        'rounds': rounds,
+        'think_s': think,
+        'elapsed_s': elapsed,
+        'reruns': len(latencies),
+        'reruns_per_s': len(latencies) / elapsed if elapsed else None,
+        'calculates_per_s': calculates / elapsed if elapsed else None,
+        'calculates_with_bucket': sum(user.studies for user in users),
+        'latency': percentiles([seconds for _, seconds in latencies]),
+        'latency_by_kind': {kind: percentiles(values) for kind, values in by_kind.items()},
+        'rss_before_bytes': rss_before,
+        'rss_after_bytes': rss_after,
+        # Whole process, shared caches included; not a per-session figure
+        'rss_growth_bytes': rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        'session_memory_bytes': None,
+        'exceptions': [message for user in users for message in user.exceptions][:20],
+        'errors': errors[:20],
+        'cache_hits': {name: info['hits'] - cache_before.get(name, {}).get('hits', 0)
+                       for name, info in cache_after.items()},
+        'cache_misses': {name: info['misses'] - cache_before.get(name, {}).get('misses', 0)
+                         for name, info in cache_after.items()},
+    }
+
+    if trace_memory:
+        # What the sessions alone hold: traced memory freed once they are gone. Shared caches filled
+        # during the level stay allocated, so they don't count against the sessions.
+        held = tracemalloc.get_traced_memory()[0]
+        del users, threads, latencies
+        gc.collect()
+        summary['session_memory_bytes'] = (held - tracemalloc.get_traced_memory()[0]) / sessions
+        tracemalloc.stop()
+    return summary
+
+
+def print_level(summary):
+    latency = summary['latency']
+    growth = summary['rss_growth_bytes']
+    session_memory = summary['session_memory_bytes']
+    print(f"{summary['sessions']:>4} sessions  {summary['reruns']:>5} reruns in {summary['elapsed_s']:7.2f}s  "
+          f"{summary['reruns_per_s']:7.1f} reruns/s  {summary['calculates_per_s']:6.2f} calculates/s", file=sys.stderr)
+    print("      rerun p50 {:.0f} ms  p95 {:.0f} ms  p99 {:.0f} ms  max {:.0f} ms".format(
+        *(latency.get(key, 0) * 1e3 for key in ('p50_s', 'p95_s', 'p99_s', 'max_s'))), file=sys.stderr)
+    calculate = summary['latency_by_kind'].get('calculate', {})
+    if calculate:
+        print("  calculate p50 {:.0f} ms  p95 {:.0f} ms".format(calculate['p50_s'] * 1e3, calculate['p95_s'] * 1e3),
+              file=sys.stderr)
+    if growth is not None:
+        print(f"      process RSS {growth / 2 ** 20:+.1f} MiB over the level", file=sys.stderr)
+    if session_memory is not None:
+        print(f"      {session_memory / 2 ** 20:.2f} MiB held per session", file=sys.stderr)
+    for message in summary['errors'] + summary['exceptions']:
+        print(f"      ! {message}", file=sys.stderr)
+
+
+def compare(before_path, after_path):
+    """Print throughput and latency for session counts present in both files."""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before['environment']['commit']} -> {after['environment']['commit']}")
+    for sessions, summary in after['results'].items():
+        old = before['results'].get(sessions)
+        if not old:
+            continue
+        print(f"{sessions:>4} sessions  reruns/s {old['reruns_per_s']:8.1f} -> {summary['reruns_per_s']:8.1f}  "
+              f"p50 {old['latency']['p50_s'] * 1e3:7.0f} -> {summary['latency']['p50_s'] * 1e3:7.0f} ms  "
+              f"p95 {old['latency']['p95_s'] * 1e3:7.0f} -> {summary['latency']['p95_s'] * 1e3:7.0f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', default='1,4,16', help="Comma-separated concurrent session counts")
+    parser.add_argument('--rounds', type=int, default=3, help="Cascade-and-Calculate rounds per session")
+    parser.add_argument('--think', type=float, default=0.0, help="Seconds each session pauses between steps")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the sessions' random choices")
+    parser.add_argument('--timeout', type=float, default=120, help="Seconds a single rerun may take")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="Measure memory held per session with tracemalloc (slows every rerun)")
+    parser.add_argument('-o', '--output', default='load_results.json', help="JSON results file")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help="Compare two results files")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = {'environment': dict(environment(), streamlit=streamlit.__version__,
+                                  trace_memory=args.trace_memory), 'results': {}}
+    with shared_runtime():
+        # Catalog loading and first imports happen here rather than in the first measured level
+        run_level(1, 1, 0.0, args.seed, args.timeout)
+        for sessions in (int(value) for value in args.sessions.split(',')):
+            summary = run_level(sessions, args.rounds, args.think, args.seed, args.timeout, args.trace_memory)
+            print_level(summary)
+            report['results'][str(sessions)] = summary
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(f"results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Regression check: the closed-form match_passes against the payload-stepping loop it replaced.
+
+    python benchmarks/match_passes_check.py
+    python benchmarks/match_passes_check.py --random 100000 --seed 7
+
+Every shipped truck payload is matched with every shipped bucket (standard
+and BHC) over a range of densities, plus ``--random`` seeded random pairs, by
+both match_passes and the loop the page used to run per scenario
+(adjust_payload_for_new_bucket). The two must agree to float rounding, apart
+from the differences match_passes documents, which come from the loop
+accumulating its increment: rounding sometimes skips the loop's final +10%
+step, which the closed form always tries, and a swing count landing right on
+the edge of the tolerance can tip either way, moving the payload by one
+increment. Those cases are counted and listed; any other difference fails
+the check with exit status 1.
+"""
+
+import argparse
+import math
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+from xmor.catalog import get_catalog  # noqa: E402
+from xmor.engine import (PAYLOAD_ALLOWANCE, PAYLOAD_STEP, SWING_TOLERANCE, calculate_bucket_load,  # noqa: E402
+                         match_passes)
+
+# Densities (kg/m³) every shipped truck and bucket pair is checked at
+DENSITIES = np.arange(1000.0, 2501.0, 75.0)
+
+# Relative difference still counted as agreement: the loop's accumulated increments against one multiplication
+RTOL = 1e-9
+
+
+def loop_reference(dump_truck_payload, bucket_payload):
+    """The original per-scenario loop, kept verbatim apart from the named constants."""
+    max_payload = dump_truck_payload * (1 + PAYLOAD_ALLOWANCE)
+    increment = dump_truck_payload * PAYLOAD_STEP
+
+    current_payload = dump_truck_payload
+    while current_payload <= max_payload:
+        swings = current_payload / bucket_payload
+        if abs(swings - math.ceil(swings)) <= SWING_TOLERANCE:
+            return current_payload, swings
+        current_payload += increment
+    return dump_truck_payload, dump_truck_payload / bucket_payload
+
+
+def samples(random_count, seed):
+    """(truck payloads, bucket payloads) in kg: the shipped catalog grid, then random pairs."""
+    catalog = get_catalog()
+    trucks = np.unique(catalog.dump_truck_data['payload'].dropna().to_numpy(dtype=float)) * 1000
+    buckets = np.unique(np.concatenate([catalog.bucket_table.bucket_size, catalog.bhc_bucket_table.bucket_size]))
+    truck, bucket, density = np.meshgrid(trucks, buckets, DENSITIES, indexing='ij')
+    rng = np.random.default_rng(seed)
+    return (np.concatenate([truck.ravel(), rng.uniform(20_000, 250_000, random_count)]),
+            np.concatenate([calculate_bucket_load(bucket, density).ravel(), rng.uniform(500, 20_000, random_count)]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--random', type=int, default=20_000, help="Random pairs on top of the catalog grid")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    trucks, buckets = samples(args.random, args.seed)
+    payload, swings = match_passes(trucks, buckets)
+
+    final_step, one_step, unexpected = [], [], []
+    for i, (truck, bucket) in enumerate(zip(trucks.tolist(), buckets.tolist())):
+        expected_payload, expected_swings = loop_reference(truck, bucket)
+        if math.isclose(payload[i], expected_payload, rel_tol=RTOL) and math.isclose(swings[i], expected_swings,
+                                                                                    rel_tol=RTOL):
+            continue
+        # The documented differences: the loop gave up where the closed form took the +10% step,
+        # or a tolerance edge tipped the other way
+        steps = (payload[i] - truck) / (truck * PAYLOAD_STEP)
+        expected_steps = (expected_payload - truck) / (truck * PAYLOAD_STEP)
+        if expected_payload == truck and math.isclose(steps, PAYLOAD_ALLOWANCE / PAYLOAD_STEP, rel_tol=RTOL):
+            final_step.append((truck, bucket))
+        elif expected_payload != truck and abs(steps - expected_steps) <= 1 + RTOL:
+            one_step.append((truck, bucket, expected_payload, float(payload[i])))
+        else:
+            unexpected.append((truck, bucket, expected_payload, float(payload[i])))
+
+    agree = len(trucks) - len(final_step) - len(one_step) - len(unexpected)
+    print(f"{len(trucks)} pairs checked: {agree} agree, {len(final_step)} differ only at the final "
+          f"+{PAYLOAD_ALLOWANCE:.0%} step, {len(one_step)} by one increment at a tolerance edge, "
+          f"{len(unexpected)} unexpected")
+    for truck, bucket in final_step:
+        print(f"  final step  truck {truck:.1f} kg, bucket {bucket:.1f} kg")
+    for truck, bucket, expected, got in one_step:
+        print(f"  one step    truck {truck:.1f} kg, bucket {bucket:.1f} kg: loop {expected:.3f}, closed form {got:.3f}")
+    for truck, bucket, expected, got in unexpected:
+        print(f"  UNEXPECTED  truck {truck:.1f} kg, bucket {bucket:.1f} kg: loop {expected:.3f}, closed form {got:.3f}")
+    return 1 if unexpected else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
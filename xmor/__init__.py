@@ -0,0 +1,11 @@
+"""Calculation and data layer behind the ONTRAC XMOR® Bucket Solution app."""
+
+_CORE_EXPORTS = ('StudyInputs', 'StudyResult', 'compute_study')
+
+
+def __getattr__(name):
+    # Resolved on first use so `python -m xmor.<tool>` and submodule imports stay light
+    if name in _CORE_EXPORTS:
+        from xmor import core
+        return getattr(core, name)
+    raise AttributeError(f"module 'xmor' has no attribute {name!r}")
@@ -0,0 +1,264 @@
+"""
+Fleet-wide batch productivity studies from the command line.
+
+Either enumerate every tabulated configuration/reach in excavator_swl.csv
+against every truck in dump_trucks.csv over a grid of densities and swing
+rates:
+
+    python -m xmor.batch --densities 1400,1600,1800 --swing-rates 2.5,3,3.5 \\
+        --current-bucket-size 2.8 --current-bucket-weight 2500 -o results.csv
+
+or run the rows of a scenario file whose columns are the StudyInputs fields:
+
+    python -m xmor.batch --scenarios scenarios.csv -o results.parquet
+    python -m xmor.batch --scenarios scenarios.csv --excel report.xlsx
+
+Work is split into chunks and spread over a process pool. Finished chunks are
+appended to the output as they arrive (in completion order), with only a few
+chunks in flight at once, so memory stays flat however large the run is.
+Parquet output needs pyarrow.
+
+With ``--excel report.xlsx`` (instead of or as well as ``-o``) every scenario's
+full comparison tables are written to one workbook, in input order, through
+``write_study_report``; scenarios are studied one at a time in this process
+and streamed to the workbook, so memory stays flat there too. They bypass the
+stage caches and the persistent result store, which are there for the page.
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import fields
+
+import numpy as np
+import pandas as pd
+
+from xmor.catalog import get_catalog
+from xmor.core import INVALID_INPUTS, STUDY_COLUMNS, StudyInputs, StudyResult, compute_studies, compute_study
+from xmor.report import write_study_report
+
+# Scenarios per chunk handed to a worker
+CHUNK_SCENARIOS = 200_000
+
+# Column types fixed for every chunk, so a chunk where a column is all blank
+# (no bucket fitted any row) doesn't set a null type the next chunk can't match
+STRING_COLUMNS = ('make', 'model', 'truck_brand', 'truck_model', 'status', 'bucket_name')
+BOOL_COLUMNS = ('select_bhc',)
+FLOAT_COLUMNS = tuple(field for field in StudyInputs.__dataclass_fields__
+                      if field not in STRING_COLUMNS + BOOL_COLUMNS) + tuple(
+    column for column in STUDY_COLUMNS if column not in STRING_COLUMNS)
+
+
+def _parse_floats(text):
+    return [float(value) for value in text.split(',') if value.strip()]
+
+
+def grid_chunks(catalog, densities, swing_rates, chunk_scenarios=CHUNK_SCENARIOS):
+    """(start, stop) ranges of selectable SWL rows, sized so each chunk is about chunk_scenarios."""
+    rows = _selectable_rows(catalog)
+    per_row = len(catalog.dump_truck_data) * len(densities) * len(swing_rates)
+    rows_per_chunk = max(1, chunk_scenarios // max(per_row, 1))
+    for start in range(0, len(rows), rows_per_chunk):
+        yield start, min(start + rows_per_chunk, len(rows))
+
+
+def _selectable_rows(catalog):
+    swl_data = catalog.swl_data
+    return np.flatnonzero(swl_data['reach'].notna().to_numpy())
+
+
+def grid_scenarios(catalog, start, stop, densities, swing_rates, fixed):
+    """Cross product of SWL rows[start:stop] x trucks x densities x swing rates as a scenario frame."""
+    swl_data = catalog.swl_data
+    trucks = catalog.dump_truck_data
+    rows = _selectable_rows(catalog)[start:stop]
+
+    row, truck, density, swing_rate = np.indices(
+        (len(rows), len(trucks), len(densities), len(swing_rates))).reshape(4, -1)
+    machines = swl_data.iloc[rows[row]]
+    chosen_trucks = trucks.iloc[truck]
+    frame = pd.DataFrame({
+        'make': machines['make'].to_numpy(),
+        'model': machines['model'].to_numpy(),
+        'boom_length': machines['boom_length'].to_numpy(),
+        'arm_length': machines['arm_length'].to_numpy(),
+        'cwt': machines['CWT'].to_numpy(),
+        'shoe_width': machines['shoe_width'].to_numpy(),
+        'reach': machines['reach'].to_numpy(),
+        'truck_brand': chosen_trucks['brand'].to_numpy(),
+        'truck_model': chosen_trucks['model'].to_numpy(),
+        'dump_truck_payload': chosen_trucks['payload'].to_numpy(),
+        'material_density': np.asarray(densities, dtype=float)[density],
+        'machine_swings_per_minute': np.asarray(swing_rates, dtype=float)[swing_rate],
+    })
+    for name, value in fixed.items():
+        frame[name] = value
+    return frame
+
+
+def _run_grid_chunk(task):
+    start, stop, densities, swing_rates, fixed = task
+    catalog = get_catalog()
+    return compute_studies(grid_scenarios(catalog, start, stop, densities, swing_rates, fixed), catalog)
+
+
+def _run_scenario_chunk(frame):
+    return compute_studies(frame, get_catalog())
+
+
+def typed_columns(frame):
+    """``frame`` with the StudyInputs and STUDY_COLUMNS columns cast to their fixed types."""
+    types = {}
+    for column in frame.columns:
+        if column in STRING_COLUMNS:
+            types[column] = 'string'
+        elif column in BOOL_COLUMNS:
+            types[column] = bool
+        elif column in FLOAT_COLUMNS:
+            types[column] = float
+    return frame.astype(types)
+
+
+def scenario_studies(frames, catalog):
+    """
+    ``(StudyInputs, StudyResult)`` for every row of each scenario frame, in order, for write_study_report.
+
+    Blank text cells become '' and a blank select_bhc False; rows compute_study
+    rejects get an INVALID_INPUTS result instead of stopping the report. Rows
+    are computed uncached, so a large run neither fills the persistent result
+    store nor evicts the page's entries from the stage caches.
+    """
+    names = [field.name for field in fields(StudyInputs)]
+    for frame in frames:
+        for row in frame.to_dict('records'):
+            values = {name: row[name] for name in names if name in row}
+            for name in ('make', 'model', 'truck_brand', 'truck_model'):
+                if name in values:
+                    values[name] = '' if values[name] != values[name] else str(values[name]).strip()
+            if 'select_bhc' in values:
+                values['select_bhc'] = values['select_bhc'] == values['select_bhc'] and bool(values['select_bhc'])
+            inputs = StudyInputs(**values)
+            try:
+                result = compute_study(inputs, catalog, cached=False)
+            except ValueError:
+                result = StudyResult(INVALID_INPUTS)
+            yield inputs, result
+
+
+class ResultWriter:
+    """Appends result chunks to a CSV or Parquet file as they arrive."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.lower().endswith(('.parquet', '.pq'))
+        self.rows = 0
+        self._writer = None
+
+    def write(self, frame):
+        if self.parquet:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise SystemExit("Parquet output needs pyarrow; install it or write to a .csv file")
+            table = pa.Table.from_pandas(typed_columns(frame), preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+        else:
+            frame.to_csv(self.path, mode='a' if self.rows else 'w', header=not self.rows, index=False)
+        self.rows += len(frame)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def run(tasks, worker, writer, workers=None):
+    """Feed tasks to a process pool, keeping at most two per worker in flight, and write each result."""
+    workers = workers or os.cpu_count() or 1
+    tasks = iter(tasks)
+    pending = set()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            while len(pending) < 2 * workers:
+                task = next(tasks, None)
+                if task is None:
+                    break
+                pending.add(executor.submit(worker, task))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                writer.write(future.result())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m xmor.batch', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-o', '--output', help="Result file (.csv, or .parquet with pyarrow)")
+    parser.add_argument('--excel', help="Workbook (.xlsx) of every scenario's comparison tables")
+    parser.add_argument('--sheet-per-scenario', action='store_true',
+                        help="Give each scenario its own sheet in the --excel workbook")
+    parser.add_argument('--scenarios', help="CSV of scenarios with StudyInputs columns, instead of the grid")
+    parser.add_argument('--densities', type=_parse_floats, default=[1800.0],
+                        help="Comma-separated material densities (kg/m³) for the grid")
+    parser.add_argument('--swing-rates', type=_parse_floats, default=[3.0],
+                        help="Comma-separated machine swings per minute for the grid")
+    parser.add_argument('--current-bucket-size', type=float, default=0.0, help="Current bucket size (m³)")
+    parser.add_argument('--current-bucket-weight', type=float, default=0.0, help="Current bucket weight (kg)")
+    parser.add_argument('--quick-hitch-weight', type=float, default=0.0, help="Quick hitch weight (kg)")
+    parser.add_argument('--bhc', action='store_true', help="Select from BHC buckets only (Heavy Duty)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SCENARIOS, help="Scenarios per chunk")
+    args = parser.parse_args(argv)
+    if not (args.output or args.excel):
+        parser.error("give -o/--output, --excel or both")
+
+    # Load in the parent so forked workers inherit the parsed catalog
+    catalog = get_catalog()
+    if args.scenarios:
+        def scenario_frames():
+            return pd.read_csv(args.scenarios, chunksize=args.chunk_size)
+        tasks = scenario_frames()
+        worker = _run_scenario_chunk
+    else:
+        if not args.current_bucket_size > 0:
+            parser.error("--current-bucket-size is required for the grid and must be greater than zero")
+        fixed = {
+            'current_bucket_size': args.current_bucket_size,
+            'current_bucket_weight': args.current_bucket_weight,
+            'quick_hitch_weight': args.quick_hitch_weight,
+            'select_bhc': args.bhc,
+        }
+
+        def scenario_frames():
+            return (grid_scenarios(catalog, start, stop, args.densities, args.swing_rates, fixed)
+                    for start, stop in grid_chunks(catalog, args.densities, args.swing_rates, args.chunk_size))
+        tasks = ((start, stop, args.densities, args.swing_rates, fixed)
+                 for start, stop in grid_chunks(catalog, args.densities, args.swing_rates, args.chunk_size))
+        worker = _run_grid_chunk
+
+    if args.output:
+        writer = ResultWriter(args.output)
+        started = time.perf_counter()
+        try:
+            run(tasks, worker, writer, args.workers)
+        finally:
+            writer.close()
+        elapsed = time.perf_counter() - started
+        print(f"{writer.rows} scenarios written to {args.output} in {elapsed:.1f}s "
+              f"({writer.rows / elapsed if elapsed else 0:,.0f} scenarios/sec)", file=sys.stderr)
+
+    if args.excel:
+        started = time.perf_counter()
+        count = write_study_report(scenario_studies(scenario_frames(), catalog), args.excel,
+                                   sheet_per_scenario=args.sheet_per_scenario)
+        elapsed = time.perf_counter() - started
+        print(f"{count} scenarios written to {args.excel} in {elapsed:.1f}s "
+              f"({count / elapsed if elapsed else 0:,.0f} scenarios/sec)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
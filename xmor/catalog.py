@@ -0,0 +1,259 @@
+"""
+Process-wide catalog of the excavator, bucket and dump truck datasets.
+
+Streamlit re-executes Ez6060.py on every widget change, but imported modules
+stay in ``sys.modules`` for the life of the server process. Keeping the parsed
+datasets here means each CSV is read and coerced once and then shared by every
+session. Every access does a cheap ``os.stat``; when a file's mtime or size
+changes its contents are re-hashed and only that dataset is re-parsed, so new
+OEM load charts can be dropped in without restarting the server. When a
+compiled copy of a CSV exists (python -m xmor.compiled) and matches it, the
+dataset is memory-mapped from there instead of parsed.
+
+The DataFrames handed out are shared between sessions and must be treated as
+read-only.
+"""
+
+import hashlib
+import io
+import os
+import threading
+
+from xmor.compiled import MANIFEST, load_dataset, read_manifest
+from xmor.engine import BucketTable
+from xmor.index import ReachIndex, SelectorIndex, SWLIndex
+
+# CSV files live next to Ez6060.py, one level above this package
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+swl_csv = 'excavator_swl.csv'
+bucket_csv = 'bucket_data.csv'
+bhc_bucket_csv = 'bhc_bucket_data.csv'
+dump_truck_csv = 'dump_trucks.csv'
+
+
+# Load datasets (pandas is only imported once a dataset is actually needed)
+def _drop_blank_columns(data):
+    # bucket_data.csv ends every row with a stray comma, which pandas reads as an empty 'Unnamed: 5'
+    blank = [name for name in data.columns
+             if str(name).startswith('Unnamed:')
+             and (data[name].isna() | (data[name].astype(str).str.strip() == '')).all()]
+    return data.drop(columns=blank)
+
+def load_bucket_data(bucket_csv):
+    import pandas as pd
+    return _drop_blank_columns(pd.read_csv(bucket_csv))
+
+def load_bhc_bucket_data(bhc_bucket_csv):
+    import pandas as pd
+    return _drop_blank_columns(pd.read_csv(bhc_bucket_csv))
+
+def load_dump_truck_data(dump_truck_csv):
+    import pandas as pd
+    return pd.read_csv(dump_truck_csv)
+
+def load_excavator_swl_data(swl_csv):
+    import pandas as pd
+    swl_data = pd.read_csv(swl_csv)
+    swl_data['boom_length'] = pd.to_numeric(swl_data['boom_length'], errors='coerce')
+    swl_data['arm_length'] = pd.to_numeric(swl_data['arm_length'], errors='coerce')
+    swl_data['CWT'] = pd.to_numeric(swl_data['CWT'], errors='coerce')
+    swl_data['shoe_width'] = pd.to_numeric(swl_data['shoe_width'], errors='coerce')
+    swl_data['reach'] = pd.to_numeric(swl_data['reach'], errors='coerce')
+    swl_data['class'] = pd.to_numeric(swl_data['class'], errors='coerce')
+    return swl_data
+
+
+# Dataset name -> (file name, loader)
+DATASETS = {
+    'swl': (swl_csv, load_excavator_swl_data),
+    'bucket': (bucket_csv, load_bucket_data),
+    'bhc_bucket': (bhc_bucket_csv, load_bhc_bucket_data),
+    'dump_truck': (dump_truck_csv, load_dump_truck_data),
+}
+
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class _Dataset:
+    """
+    One cached dataset plus the file signatures and digest it was loaded from.
+
+    Loads from the compiled copy (see xmor.compiled) when there is one for the
+    current CSV contents, otherwise parses the CSV. A CSV that disappears
+    after the first load leaves the last good data in place.
+    """
+
+    __slots__ = ('path', 'loader', 'compiled_dir', 'signature', 'digest', 'data', 'derived')
+
+    def __init__(self, path, loader, compiled_dir=None):
+        self.path = path
+        self.loader = loader
+        self.compiled_dir = compiled_dir
+        self.signature = None
+        self.digest = None
+        self.data = None
+        # builder -> structure built from data, dropped whenever data is reloaded
+        self.derived = {}
+
+    def refresh(self):
+        """Reload if the CSV or its compiled copy changed since the last load. Returns True on reload."""
+        manifest_path = os.path.join(self.compiled_dir, MANIFEST) if self.compiled_dir else None
+        csv_signature = _signature(self.path)
+        signature = (csv_signature, _signature(manifest_path) if manifest_path else None)
+        if signature == self.signature:
+            return False
+
+        manifest = read_manifest(self.compiled_dir) if signature[1] else None
+        raw = None
+        if manifest is not None and (csv_signature is None
+                                     or manifest['source_signature'] == list(csv_signature)):
+            # Compiled from exactly this file (or shipped without the CSV)
+            digest = manifest['source_digest']
+        else:
+            try:
+                with open(self.path, 'rb') as f:
+                    raw = f.read()
+            except FileNotFoundError:
+                # Only missing for a moment while it is replaced (a rename over it): keep serving the
+                # data already loaded and look again on the next access
+                if self.data is None:
+                    raise
+                return False
+            digest = hashlib.sha1(raw).hexdigest()
+            # A copied or touched CSV can still use the compiled copy if the contents match
+            if manifest is not None and manifest['source_digest'] != digest:
+                manifest = None
+
+        self.signature = signature
+        if digest == self.digest:
+            # Touched but not edited
+            return False
+
+        if manifest is not None:
+            self.data = load_dataset(self.compiled_dir, manifest)
+        else:
+            self.data = self.loader(io.BytesIO(raw))
+        self.digest = digest
+        self.derived = {}
+        return True
+
+
+class Catalog:
+    """Lazily loaded, change-aware view over the four CSV datasets."""
+
+    def __init__(self, data_dir=DATA_DIR, compiled_dir=None):
+        self.data_dir = data_dir
+        self.compiled_dir = compiled_dir or os.path.join(data_dir, 'compiled')
+        self._lock = threading.Lock()
+        self._datasets = {
+            name: _Dataset(os.path.join(data_dir, file_name), loader, os.path.join(self.compiled_dir, name))
+            for name, (file_name, loader) in DATASETS.items()
+        }
+
+    def parsed_datasets(self):
+        """(name, dataset) pairs freshly parsed from the CSVs, ignoring compiled copies; used to compile."""
+        for name, (file_name, loader) in DATASETS.items():
+            dataset = _Dataset(os.path.join(self.data_dir, file_name), loader)
+            dataset.refresh()
+            yield name, dataset
+
+    def get(self, name):
+        """Return the DataFrame for ``name``, reloading it first if the file changed."""
+        dataset = self._datasets[name]
+        with self._lock:
+            dataset.refresh()
+            return dataset.data
+
+    def derive(self, name, builder):
+        """
+        Return ``builder(data)`` for dataset ``name``, built once per loaded version.
+
+        Used for indexes over a dataset so they are shared like the data itself
+        and rebuilt only when the underlying file changes.
+        """
+        dataset = self._datasets[name]
+        with self._lock:
+            dataset.refresh()
+            if builder not in dataset.derived:
+                dataset.derived[builder] = builder(dataset.data)
+            return dataset.derived[builder]
+
+    def refresh(self):
+        """Check every dataset and return the names of those that were reloaded."""
+        with self._lock:
+            return [name for name, dataset in self._datasets.items() if dataset.refresh()]
+
+    @property
+    def version(self):
+        """Combined content digest of all datasets, changes whenever any file's contents do."""
+        self.refresh()
+        combined = hashlib.sha1()
+        for name in sorted(self._datasets):
+            combined.update(self._datasets[name].digest.encode())
+        return combined.hexdigest()
+
+    @property
+    def swl_data(self):
+        return self.get('swl')
+
+    @property
+    def selector_index(self):
+        return self.derive('swl', SelectorIndex)
+
+    @property
+    def swl_index(self):
+        return self.derive('swl', SWLIndex)
+
+    @property
+    def reach_index(self):
+        return self.derive('swl', ReachIndex)
+
+    @property
+    def bucket_data(self):
+        return self.get('bucket')
+
+    @property
+    def bhc_bucket_data(self):
+        return self.get('bhc_bucket')
+
+    @property
+    def bucket_table(self):
+        return self.derive('bucket', BucketTable)
+
+    @property
+    def bhc_bucket_table(self):
+        return self.derive('bhc_bucket', BucketTable)
+
+    @property
+    def dump_truck_data(self):
+        return self.get('dump_truck')
+
+    @property
+    def truck_payloads(self):
+        """{model: rated payload in tonnes} from dump_trucks.csv."""
+        return self.derive('dump_truck', _truck_payloads)
+
+
+def _truck_payloads(trucks):
+    # Built back to front so the first row for a model wins, as in the page's selectboxes
+    return dict(zip(trucks['model'].tolist()[::-1], trucks['payload'].tolist()[::-1]))
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_catalog():
+    """Return the process-wide Catalog shared by all sessions."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = Catalog()
+    return _catalog
@@ -0,0 +1,140 @@
+"""
+Compiled, memory-mapped form of the catalog CSVs.
+
+    python -m xmor.compiled            # writes ./compiled/ next to the CSVs
+
+Each dataset becomes a directory of one ``.npy`` file per column plus a
+``manifest.json``. Text columns (make, model, brand, type, bucket names) are
+stored as categorical codes with their category list in the manifest;
+numeric columns use the smallest integer or float type that holds every
+value exactly, so keys such as a 7.06 m boom still compare equal after
+loading. The datasets are produced by the same loaders as the CSV path, so
+coercions and clean-up apply identically.
+
+Loading maps every column with ``np.load(mmap_mode='r')`` and wraps the
+arrays without copying, so start-up does no parsing and worker processes
+share the same page-cache pages. The manifest records the source CSV's
+signature and digest; the catalog only uses a compiled dataset that matches
+its CSV and otherwise falls back to parsing, so a stale compile is never
+served.
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+MANIFEST = 'manifest.json'
+FORMAT_VERSION = 1
+
+_INTEGER_TYPES = (np.int8, np.int16, np.int32, np.int64)
+
+
+def _compact(values):
+    """Smallest dtype that round-trips every value exactly."""
+    values = np.asarray(values)
+    if values.dtype.kind in 'iu':
+        for dtype in _INTEGER_TYPES:
+            info = np.iinfo(dtype)
+            if not len(values) or (values.min() >= info.min and values.max() <= info.max):
+                return values.astype(dtype)
+    if values.dtype.kind == 'f':
+        narrow = values.astype(np.float32)
+        if np.array_equal(narrow.astype(values.dtype), values, equal_nan=True):
+            return narrow
+    return values
+
+
+def _codes_dtype(count):
+    for dtype in _INTEGER_TYPES:
+        if count < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def write_dataset(frame, directory, source_signature, source_digest):
+    """Write one DataFrame as per-column .npy files and a manifest."""
+    import pandas as pd
+
+    os.makedirs(directory, exist_ok=True)
+    columns = []
+    for position, name in enumerate(frame.columns):
+        series = frame[name]
+        file_name = f"{position}.npy"
+        entry = {'name': name, 'file': file_name}
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            array = _compact(series.to_numpy())
+        else:
+            categorical = pd.Categorical(series)
+            entry['categories'] = [str(category) for category in categorical.categories]
+            array = categorical.codes.astype(_codes_dtype(len(categorical.categories)))
+        entry['dtype'] = array.dtype.str
+        np.save(os.path.join(directory, file_name), array, allow_pickle=False)
+        columns.append(entry)
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'rows': len(frame),
+        'source_signature': list(source_signature),
+        'source_digest': source_digest,
+        'columns': columns,
+    }
+    # Write the manifest last, via rename, so readers never see a half-written dataset
+    temporary = os.path.join(directory, MANIFEST + '.tmp')
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(temporary, os.path.join(directory, MANIFEST))
+
+
+def read_manifest(directory):
+    """The dataset's manifest, or None if it hasn't been compiled (or uses another format)."""
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('format_version') == FORMAT_VERSION else None
+
+
+def load_dataset(directory, manifest):
+    """DataFrame over memory-mapped column files; read-only, shares pages with other processes."""
+    import pandas as pd
+
+    data = {}
+    for entry in manifest['columns']:
+        array = np.load(os.path.join(directory, entry['file']), mmap_mode='r', allow_pickle=False)
+        if 'categories' in entry:
+            array = pd.Categorical.from_codes(array, entry['categories'])
+        data[entry['name']] = array
+    return pd.DataFrame(data, copy=False)
+
+
+def compile_catalog(catalog=None, output_dir=None):
+    """Compile every dataset of ``catalog`` into ``output_dir``. Returns the dataset names written."""
+    from xmor.catalog import get_catalog
+
+    catalog = catalog or get_catalog()
+    output_dir = output_dir or catalog.compiled_dir
+    written = []
+    for name, dataset in catalog.parsed_datasets():
+        write_dataset(dataset.data, os.path.join(output_dir, name), dataset.signature[0], dataset.digest)
+        written.append(name)
+    return written
+
+
+def main(argv=None):
+    from xmor.catalog import Catalog, DATA_DIR
+
+    parser = argparse.ArgumentParser(prog='python -m xmor.compiled', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Directory holding the CSVs")
+    parser.add_argument('--output', default=None, help="Output directory (default: <data-dir>/compiled)")
+    args = parser.parse_args(argv)
+
+    catalog = Catalog(args.data_dir)
+    for name in compile_catalog(catalog, args.output):
+        print(f"compiled {name}")
+
+
+if __name__ == '__main__':
+    main()
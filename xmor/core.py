@@ -0,0 +1,664 @@
+"""
+Headless productivity study: everything the Calculate button does, without Streamlit.
+
+``compute_study`` takes the same inputs as the page's ``user_data`` dict and
+returns a StudyResult holding the SWL, the optimal XMOR® bucket, the loadout
+figures for both buckets and the four comparison tables. Only NumPy is
+imported up front; pandas is pulled in by the catalog the first time a CSV is
+parsed, and nothing here touches Streamlit, PIL or xlsxwriter.
+"""
+
+import math
+from dataclasses import asdict, dataclass, fields
+
+from xmor.catalog import get_catalog
+from xmor.engine import (CLASS_TOLERANCE, CYCLE_TIME_IMPROVEMENT, LOADOUT_EFFICIENCY, SIMULATED_SWINGS, Loadout,
+                         calculate_bucket_load, loadout_metrics, match_passes, productivity_gain,
+                         select_optimal_buckets)
+from xmor.index import config_key
+from xmor.memo import stage_cache
+from xmor.store import get_store
+from xmor.timing import stage, timed
+
+# StudyResult.status values
+OK = 'ok'
+NO_MATCHING_CONFIGURATION = 'no_matching_configuration'
+NO_SUITABLE_BUCKET = 'no_suitable_bucket'
+
+# Table titles, in display order
+SIDE_BY_SIDE = "Side-by-Side Bucket Comparison"
+LOADOUT_PRODUCTIVITY = "Loadout Productivity & Truck Pass Simulation"
+SWINGS_SIMULATION = "1000 Swings Side-by-Side Simulation"
+IMPROVED_CYCLE = "10% Improved Cycle Time Simulation"
+
+# Key for each table outside the page (JSON, stored results), after the page's variable names
+TABLE_KEYS = {
+    SIDE_BY_SIDE: 'side_by_side_data',
+    LOADOUT_PRODUCTIVITY: 'loadout_productivity_data',
+    SWINGS_SIMULATION: 'swings_simulation_data',
+    IMPROVED_CYCLE: 'improved_cycle_data',
+}
+
+
+@dataclass(frozen=True, slots=True)
+class StudyInputs:
+    """One scenario. Field names match the page's user_data dict."""
+    make: str
+    model: str
+    boom_length: float
+    arm_length: float
+    cwt: float
+    shoe_width: float
+    reach: float
+    material_density: float
+    quick_hitch_weight: float
+    current_bucket_size: float
+    current_bucket_weight: float
+    dump_truck_payload: float  # rated payload in tonnes
+    machine_swings_per_minute: float
+    select_bhc: bool = False
+    truck_brand: str = ''
+    truck_model: str = ''
+
+    def to_user_data(self):
+        return {field.name: getattr(self, field.name) for field in fields(self)}
+
+    def normalized(self):
+        """
+        These inputs as they are computed and stored: text stripped, numbers
+        as floats and select_bhc as a bool. Raises ValueError for a number
+        field that isn't one.
+        """
+        values = {}
+        for field in fields(self):
+            value = getattr(self, field.name)
+            if field.type is str:
+                value = value.strip() if isinstance(value, str) else value
+            elif field.type is float:
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    raise ValueError(f"{field.name.replace('_', ' ').capitalize()} must be a number")
+            else:
+                value = bool(value)
+            values[field.name] = value
+        return StudyInputs(**values)
+
+    def validate(self):
+        """Raise ValueError for inputs the productivity figures would divide by."""
+        for name in ('material_density', 'current_bucket_size', 'dump_truck_payload',
+                     'machine_swings_per_minute'):
+            if not getattr(self, name) > 0:
+                raise ValueError(f"{name.replace('_', ' ').capitalize()} must be greater than zero")
+
+
+@dataclass(frozen=True, slots=True)
+class OptimalBucket:
+    bucket_name: str
+    bucket_size: float
+    bucket_weight: float
+    total_bucket_weight: float
+
+
+@dataclass(frozen=True, slots=True)
+class StudyResult:
+    status: str
+    swl: float = None
+    optimal_bucket: OptimalBucket = None
+    old: Loadout = None
+    new: Loadout = None
+    old_total_load: float = None
+    productivity: float = None
+    # Title -> {column header: [cell, ...]}, as passed to generate_html_table
+    tables: dict = None
+
+    @property
+    def ok(self):
+        return self.status == OK
+
+    @property
+    def productivity_text(self):
+        return f"{self.productivity:.0f}%"
+
+    def to_dict(self):
+        """JSON-ready form: NaN becomes None and tables are keyed by TABLE_KEYS."""
+        def number(value):
+            return None if value is None or math.isnan(value) else value
+
+        result = {
+            'status': self.status,
+            'swl': number(self.swl),
+            'optimal_bucket': asdict(self.optimal_bucket) if self.optimal_bucket else None,
+        }
+        if self.ok:
+            result.update({
+                'productivity': number(self.productivity),
+                'productivity_text': self.productivity_text,
+                'old_total_load': number(self.old_total_load),
+                'old': {name: number(value) for name, value in asdict(self.old).items()},
+                'new': {name: number(value) for name, value in asdict(self.new).items()},
+                'tables': {TABLE_KEYS[title]: table for title, table in self.tables.items()},
+            })
+        return result
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a StudyResult from ``to_dict()`` output, with None figures back as NaN."""
+        def number(value):
+            return float('nan') if value is None else value
+
+        status = data['status']
+        optimal_bucket = OptimalBucket(**data['optimal_bucket']) if data['optimal_bucket'] else None
+        if status != OK:
+            # Only a missing configuration has no SWL at all; 'N/A' loads come back as NaN
+            swl = None if status == NO_MATCHING_CONFIGURATION else number(data['swl'])
+            return cls(status, swl, optimal_bucket)
+        return cls(
+            status, number(data['swl']), optimal_bucket,
+            Loadout(**{name: number(value) for name, value in data['old'].items()}),
+            Loadout(**{name: number(value) for name, value in data['new'].items()}),
+            number(data['old_total_load']), number(data['productivity']),
+            {title: data['tables'][key] for title, key in TABLE_KEYS.items()},
+        )
+
+
+def _scalar_loadout(loadout):
+    # Single-scenario results are plain floats rather than 0-d arrays
+    return Loadout(*(float(getattr(loadout, field.name)) for field in fields(Loadout)))
+
+
+def find_matching_swl(inputs, catalog=None):
+    catalog = catalog or get_catalog()
+    return catalog.swl_index.lookup(config_key(inputs.to_user_data()), inputs.reach)
+
+
+def find_swl_at_reaches(inputs, reaches, catalog=None):
+    """SWL for the inputs' configuration at any number of reaches, interpolated between chart points."""
+    catalog = catalog or get_catalog()
+    return catalog.swl_index.interpolate(config_key(inputs.to_user_data()), reaches)
+
+
+def select_optimal_bucket(inputs, swl, catalog=None):
+    catalog = catalog or get_catalog()
+    buckets = catalog.bhc_bucket_table if inputs.select_bhc else catalog.bucket_table
+    excavator_class = catalog.swl_index.classes.get(inputs.model, float('nan'))
+    choice, total_bucket_weight = select_optimal_buckets(
+        buckets, swl, inputs.material_density, inputs.quick_hitch_weight, excavator_class)
+
+    choice = int(choice)
+    if choice < 0:
+        return None
+    return OptimalBucket(str(buckets.bucket_name[choice]), float(buckets.bucket_size[choice]),
+                         float(buckets.bucket_weight[choice]), float(total_bucket_weight))
+
+
+def find_carrying_configurations(bucket_name, material_density, quick_hitch_weight=0.0, catalog=None):
+    """
+    Every machine configuration that can carry ``bucket_name`` at this density, and how far out.
+
+    The reverse of select_optimal_bucket: the load is quick hitch + bucket
+    load + bucket weight, and a configuration qualifies when its class is
+    within CLASS_TOLERANCE of the bucket's and some tabulated reach has an SWL
+    of at least that load. Returns a DataFrame of the configuration columns
+    with the class, longest such reach (``max_reach``), the SWL there and the
+    share of it the bucket uses, in chart order. Raises ValueError for a
+    bucket in neither catalog or a non-positive density.
+    """
+    import pandas as pd
+
+    if not material_density > 0:
+        raise ValueError("Material density must be greater than zero")
+    catalog = catalog or get_catalog()
+    for buckets in (catalog.bucket_table, catalog.bhc_bucket_table):
+        position = buckets.positions.get(bucket_name)
+        if position is not None:
+            break
+    else:
+        raise ValueError(f"Unknown bucket: {bucket_name}")
+
+    load = (quick_hitch_weight + calculate_bucket_load(buckets.bucket_size[position], material_density)
+            + buckets.bucket_weight[position])
+    reach_index = catalog.reach_index
+    rows, max_reach, swl = reach_index.carriers(load, buckets.bucket_class[position] - CLASS_TOLERANCE)
+
+    columns = {level: values[rows] for level, values in reach_index.levels.items()}
+    return pd.DataFrame({**columns, 'class': reach_index.classes[rows], 'max_reach': max_reach, 'swl': swl,
+                         'total_load': load, 'swl_utilisation': load / swl})
+
+
+SWEEP_COLUMNS = ['reach', 'swl', 'bucket_name', 'bucket_size', 'total_bucket_weight', 'swl_margin',
+                 'swl_utilisation', 'productivity']
+
+
+@timed('reach_sweep')
+def sweep_reaches(inputs, step=None, catalog=None):
+    """
+    Optimal bucket and productivity at every reach of the inputs' configuration, in one pass.
+
+    With no ``step`` the sweep covers the tabulated reaches, with the same SWL
+    find_matching_swl gives at each; with a ``step`` (m) it covers an even
+    grid across the tabulated range, with SWL interpolated between chart
+    points as in find_swl_at_reaches. Bucket choice, pass matching and the
+    productivity gain then run once over all reaches, as select_optimal_bucket
+    and compute_study would for each. The inputs' own reach is ignored.
+    Returns a DataFrame of SWEEP_COLUMNS in ascending reach, empty when the
+    configuration isn't in the chart; reaches where no bucket fits have no
+    bucket and NaN figures.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if not isinstance(inputs, StudyInputs):
+        inputs = StudyInputs(**inputs)
+    inputs.validate()
+    catalog = catalog or get_catalog()
+    swl_index = catalog.swl_index
+    config = config_key(inputs.to_user_data())
+
+    chart = swl_index.exact.get(config, {})
+    if step is None:
+        reaches = np.array(sorted(chart), dtype=float)
+        swl = np.array([chart[reach] for reach in sorted(chart)], dtype=float)
+    else:
+        if not step > 0:
+            raise ValueError("Reach step must be greater than zero")
+        curve = swl_index.curves.get(config)
+        if curve is None:
+            reaches = np.empty(0)
+        else:
+            # Multiples of the step from the first chart reach; accumulating the step (np.arange)
+            # can land the last point just past the chart, where the SWL is NaN
+            start, end = curve[0][0], curve[0][-1]
+            count = int(np.floor((end - start) / step + 1e-9)) + 1
+            reaches = np.minimum(start + step * np.arange(count), end)
+        swl = swl_index.interpolate(config, reaches)
+    if not len(reaches):
+        return pd.DataFrame(columns=SWEEP_COLUMNS)
+
+    buckets = catalog.bhc_bucket_table if inputs.select_bhc else catalog.bucket_table
+    excavator_class = swl_index.classes.get(inputs.model, float('nan'))
+    choice, total_bucket_weight = select_optimal_buckets(
+        buckets, swl, inputs.material_density, inputs.quick_hitch_weight, excavator_class)
+    found = choice >= 0
+    bucket_size = np.where(found, buckets.bucket_size[choice], np.nan)
+
+    dump_truck_payload = inputs.dump_truck_payload * 1000
+    old = loadout_metrics(inputs.current_bucket_size, inputs.material_density, dump_truck_payload,
+                          inputs.machine_swings_per_minute)
+    new = loadout_metrics(bucket_size, inputs.material_density, dump_truck_payload,
+                          inputs.machine_swings_per_minute)
+
+    return pd.DataFrame({
+        'reach': reaches,
+        'swl': swl,
+        'bucket_name': np.where(found, buckets.bucket_name[choice], None),
+        'bucket_size': bucket_size,
+        'total_bucket_weight': total_bucket_weight,
+        'swl_margin': swl - total_bucket_weight,
+        'swl_utilisation': total_bucket_weight / swl,
+        'productivity': productivity_gain(old.total_tonnage_per_hour, new.total_tonnage_per_hour),
+    })
+
+
+def sweep_table(sweep):
+    """{column header: [cell, ...]} of a sweep_reaches frame, in the page's table format."""
+    def cells(values, text):
+        return [text(value) if value == value else '-' for value in values]
+
+    return {
+        'Reach (m)': [f"{reach:g}" for reach in sweep['reach']],
+        'SWL (kg)': cells(sweep['swl'], lambda value: f"{value:,.0f}"),
+        'XMOR® Bucket': [name if isinstance(name, str) else '-' for name in sweep['bucket_name']],
+        'Suspended Load (kg)': cells(sweep['total_bucket_weight'], lambda value: f"{value:,.0f}"),
+        'SWL Margin (kg)': cells(sweep['swl_margin'], lambda value: f"{value:,.0f}"),
+        'SWL Used': cells(sweep['swl_utilisation'], lambda value: f"{100 * value:.0f}%"),
+        'Productivity Improvement': cells(sweep['productivity'], lambda value: f"{value:.0f}%"),
+    }
+
+
+# Memoized stages behind compute_study; see xmor/memo.py
+_swl_stage = stage_cache('swl')
+_bucket_stage = stage_cache('optimal_bucket')
+_passes_stage = stage_cache('pass_matching')
+_loadout_stage = stage_cache('loadout')
+_tables_stage = stage_cache('tables')
+_result_stage = stage_cache('result')
+
+
+def _staged(cache, key, compute, cached):
+    # A stage's memoized value, or a fresh one for callers that mustn't fill the caches
+    return cache.get(key, compute) if cached else compute()
+
+
+def _loadout(bucket_size, material_density, dump_truck_payload, machine_swings_per_minute, cached=True):
+    # Loadout figures for one bucket; pass matching doesn't depend on the swing rate, so it has a stage of its own
+    def match():
+        with stage('pass_matching'):
+            return match_passes(dump_truck_payload * 1000, calculate_bucket_load(bucket_size, material_density))
+    matched = _staged(_passes_stage, (bucket_size, material_density, dump_truck_payload), match, cached)
+
+    def compute():
+        return _scalar_loadout(loadout_metrics(bucket_size, material_density, dump_truck_payload * 1000,
+                                               machine_swings_per_minute, matched=matched))
+    return _staged(_loadout_stage, (bucket_size, material_density, dump_truck_payload, machine_swings_per_minute),
+                   compute, cached)
+
+
+@timed('compute_study')
+def compute_study(inputs, catalog=None, cached=True):
+    """
+    Run the full productivity study for one scenario.
+
+    ``inputs`` is a StudyInputs or a user_data-style dict, normalized (see
+    StudyInputs.normalized) before anything else. Returns a StudyResult
+    whose status says whether a configuration and bucket were found; raises
+    ValueError for non-numeric figures and for non-positive density, bucket
+    size, truck payload or swing rate.
+
+    Each stage is memoized on the inputs it actually reads (plus the catalog
+    version where it reads the catalog), so only stages whose inputs changed
+    since an earlier call run again, and an identical call returns the same
+    StudyResult object. Results for the shared catalog are also kept in the
+    persistent store, so they survive restarts and are shared by processes.
+    With ``cached=False`` neither the caches nor the store are read or
+    written, for bulk runs (python -m xmor.batch --excel) whose one-off
+    scenarios would otherwise crowd out the page's.
+    """
+    if not isinstance(inputs, StudyInputs):
+        inputs = StudyInputs(**inputs)
+    # Normalized once, so the caches and the store key on exactly what is computed
+    inputs = inputs.normalized()
+    inputs.validate()
+    catalog = catalog or get_catalog()
+    version = catalog.version
+    if not cached:
+        return _run_study(inputs, catalog, version, cached=False)
+    return _result_stage.get((catalog, version, inputs), lambda: _stored_study(inputs, catalog, version))
+
+
+def _stored_study(inputs, catalog, version):
+    # The on-disk store (xmor/store.py) backs the shared catalog only, so test or
+    # benchmark catalogs never churn it
+    store = get_store() if catalog is get_catalog() else None
+    if store is None:
+        return _run_study(inputs, catalog, version)
+    result = store.get(inputs, version)
+    if result is None:
+        result = _run_study(inputs, catalog, version)
+        store.put(inputs, version, result)
+    return result
+
+
+def _run_study(inputs, catalog, version, cached=True):
+    def find_swl():
+        with stage('swl_lookup'):
+            return find_matching_swl(inputs, catalog)
+    swl = _staged(_swl_stage, (catalog, version, config_key(inputs.to_user_data()), inputs.reach), find_swl, cached)
+    if not swl:
+        return StudyResult(NO_MATCHING_CONFIGURATION)
+
+    def choose_bucket():
+        with stage('bucket_selection'):
+            return select_optimal_bucket(inputs, swl, catalog)
+    optimal_bucket = _staged(_bucket_stage, (catalog, version, swl, inputs.model, inputs.select_bhc,
+                                             inputs.material_density, inputs.quick_hitch_weight), choose_bucket, cached)
+    if optimal_bucket is None:
+        return StudyResult(NO_SUITABLE_BUCKET, swl=swl)
+
+    old = _loadout(inputs.current_bucket_size, inputs.material_density, inputs.dump_truck_payload,
+                   inputs.machine_swings_per_minute, cached)
+    new = _loadout(optimal_bucket.bucket_size, inputs.material_density, inputs.dump_truck_payload,
+                   inputs.machine_swings_per_minute, cached)
+
+    # Total suspended load
+    old_total_load = old.bucket_payload + inputs.current_bucket_weight + inputs.quick_hitch_weight
+
+    productivity = float(productivity_gain(old.total_tonnage_per_hour, new.total_tonnage_per_hour))
+
+    def make_tables():
+        with stage('tables'):
+            return build_tables(inputs, optimal_bucket, old, new, old_total_load)
+    # Everything build_tables reads: the old and new loadouts follow from the bucket sizes,
+    # density, payload and swing rate
+    tables = _staged(_tables_stage, (optimal_bucket, inputs.current_bucket_size, inputs.current_bucket_weight,
+                                     inputs.quick_hitch_weight, inputs.material_density, inputs.dump_truck_payload,
+                                     inputs.machine_swings_per_minute, inputs.truck_brand, inputs.truck_model),
+                     make_tables, cached)
+    return StudyResult(OK, swl, optimal_bucket, old, new, old_total_load, productivity, tables)
+
+
+def build_tables(inputs, optimal_bucket, old, new, old_total_load):
+    """The four comparison tables shown on the page, as dicts of formatted columns."""
+    old_capacity = inputs.current_bucket_size
+    new_capacity = optimal_bucket.bucket_size
+    old_payload, new_payload = old.bucket_payload, new.bucket_payload
+    new_total_load = optimal_bucket.total_bucket_weight
+    material_density = inputs.material_density
+    dump_truck_payload = inputs.dump_truck_payload * 1000
+    efficiency = f"{LOADOUT_EFFICIENCY * 100:.0f}%"
+    improved = CYCLE_TIME_IMPROVEMENT
+
+    # Side-by-Side Bucket Comparison Data
+    side_by_side_data = {
+        'Description': [
+            'Capacity (m³)', 'Material Density (kg/m³)', 'Bucket Payload (kg)',
+            'Total Suspended Load (kg)'
+        ],
+        'Old Bucket': [
+            f"{old_capacity:.1f}", f"{material_density:.0f}", f"{old_payload:.0f}",
+            f"{old_total_load:.0f}"
+        ],
+        'XMOR® Bucket': [
+            f"{new_capacity:.1f}", f"{material_density:.0f}", f"{new_payload:.0f}",
+            f"{new_total_load:.0f}"
+        ],
+        'Difference': [
+            f"{new_capacity - old_capacity:.1f}", '-', f"{new_payload - old_payload:.0f}",
+            f"{new_total_load - old_total_load:.0f}"
+        ],
+        '% Difference': [
+            f"{(new_capacity - old_capacity) / old_capacity * 100:.0f}%", '-',
+            f"{(new_payload - old_payload) / old_payload * 100:.0f}%",
+            f"{(new_total_load - old_total_load) / old_total_load * 100:.0f}%"
+        ]
+    }
+
+    # Loadout Productivity & Truck Pass Simulation Data
+    loadout_productivity_data = {
+        'Description': [
+            f"{inputs.truck_brand} {inputs.truck_model} Payload (kg)", 'Avg No. Swings to Fill Truck',
+            'Time to Fill Truck (min)', f"Avg Trucks/Hour @ {efficiency} eff", 'Swings/Hour', 'Tonnes/Hour'
+        ],
+        'Old Bucket': [
+            f"{old.truck_payload:.0f}{'*' if old.truck_payload != dump_truck_payload else ''}",
+            f"{old.swings_to_fill_truck:.1f}", f"{old.time_to_fill_truck:.1f}",
+            f"{old.avg_trucks_per_hour:.1f}", f"{old.swings_per_hour:.0f}", f"{old.truck_tonnage_per_hour:.0f}"
+        ],
+        'XMOR® Bucket': [
+            f"{new.truck_payload:.0f}{'*' if new.truck_payload != dump_truck_payload else ''}",
+            f"{new.swings_to_fill_truck:.1f}", f"{new.time_to_fill_truck:.1f}",
+            f"{new.avg_trucks_per_hour:.1f}", f"{new.swings_per_hour:.0f}", f"{new.truck_tonnage_per_hour:.0f}"
+        ],
+        'Difference': [
+            f"{new.truck_payload - old.truck_payload:.0f}",
+            f"{new.swings_to_fill_truck - old.swings_to_fill_truck:.1f}",
+            f"{new.time_to_fill_truck - old.time_to_fill_truck:.1f}",
+            f"{new.avg_trucks_per_hour - old.avg_trucks_per_hour:.1f}",
+            "-", f"{new.truck_tonnage_per_hour - old.truck_tonnage_per_hour:.0f}"
+        ],
+        '% Difference': [
+            f"{(new.truck_payload - old.truck_payload) / old.truck_payload * 100:.0f}%",
+            f"{(new.swings_to_fill_truck - old.swings_to_fill_truck) / old.swings_to_fill_truck * 100:.0f}%",
+            f"{(new.time_to_fill_truck - old.time_to_fill_truck) / old.time_to_fill_truck * 100:.0f}%",
+            f"{(new.avg_trucks_per_hour - old.avg_trucks_per_hour) / old.avg_trucks_per_hour * 100:.0f}%",
+            "-",
+            f"{(new.truck_tonnage_per_hour - old.truck_tonnage_per_hour) / old.truck_tonnage_per_hour * 100:.0f}%"
+        ]
+    }
+
+    # 1000 Swings Side-by-Side Simulation Data
+    swings_simulation_data = {
+        'Description': [
+            'Number of Swings', 'Total Volume (m³)',
+            'Total Tonnes', 'Total Trucks'
+        ],
+        'Old Bucket': [
+            f"{SIMULATED_SWINGS}", f"{old.total_m3_per_day:.0f}", f"{old.total_tonnage_per_day:.0f}",
+            f"{old.total_trucks_per_day:.0f}"
+        ],
+        'XMOR® Bucket': [
+            f"{SIMULATED_SWINGS}", f"{new.total_m3_per_day:.0f}", f"{new.total_tonnage_per_day:.0f}",
+            f"{new.total_trucks_per_day:.0f}"
+        ],
+        'Difference': [
+            '-', f"{new.total_m3_per_day - old.total_m3_per_day:.0f}",
+            f"{new.total_tonnage_per_day - old.total_tonnage_per_day:.0f}",
+            f"{new.total_trucks_per_day - old.total_trucks_per_day:.0f}"
+        ],
+        '% Difference': [
+            '-', f"{(new.total_m3_per_day - old.total_m3_per_day) / old.total_m3_per_day * 100:.0f}%",
+            f"{(new.total_tonnage_per_day - old.total_tonnage_per_day) / old.total_tonnage_per_day * 100:.0f}%",
+            f"{(new.total_trucks_per_day - old.total_trucks_per_day) / old.total_trucks_per_day * 100:.0f}%"
+        ]
+    }
+
+    # 10% Improved Cycle Time Simulation Data
+    improved_cycle_data = {
+        'Description': [
+            'Number of Swings', 'Total Volume (m³)',
+            'Total Tonnes', 'Total Trucks'
+        ],
+        'Old Bucket': [
+            f"{SIMULATED_SWINGS}", f"{old.total_m3_per_day:.0f}", f"{old.total_tonnage_per_day:.0f}",
+            f"{old.total_trucks_per_day:.0f}"
+        ],
+        'XMOR® Bucket': [
+            f"{improved * SIMULATED_SWINGS:.0f}", f"{improved * new.total_m3_per_day:.0f}",
+            f"{improved * new.total_tonnage_per_day:.0f}", f"{improved * new.total_trucks_per_day:.0f}"
+        ],
+        'Difference': [
+            f"{improved * SIMULATED_SWINGS - SIMULATED_SWINGS:.0f}",
+            f"{improved * new.total_m3_per_day - old.total_m3_per_day:.0f}",
+            f"{improved * new.total_tonnage_per_day - old.total_tonnage_per_day:.0f}",
+            f"{improved * new.total_trucks_per_day - old.total_trucks_per_day:.0f}"
+        ],
+        '% Difference': [
+            f"{(improved - 1) * 100:.0f}%",
+            f"{(improved * new.total_m3_per_day - old.total_m3_per_day) / old.total_m3_per_day * 100:.0f}%",
+            f"{(improved * new.total_tonnage_per_day - old.total_tonnage_per_day) / old.total_tonnage_per_day * 100:.0f}%",
+            f"{(improved * new.total_trucks_per_day - old.total_trucks_per_day) / old.total_trucks_per_day * 100:.0f}%"
+        ]
+    }
+
+    return {
+        SIDE_BY_SIDE: side_by_side_data,
+        LOADOUT_PRODUCTIVITY: loadout_productivity_data,
+        SWINGS_SIMULATION: swings_simulation_data,
+        IMPROVED_CYCLE: improved_cycle_data,
+    }
+
+
+# Per-scenario output columns of compute_studies, after the input columns
+STUDY_COLUMNS = (
+    'status', 'swl', 'bucket_name', 'bucket_size', 'total_bucket_weight', 'old_total_load',
+    'old_truck_payload', 'new_truck_payload', 'old_swings_to_fill_truck', 'new_swings_to_fill_truck',
+    'old_avg_trucks_per_hour', 'new_avg_trucks_per_hour', 'old_truck_tonnage_per_hour',
+    'new_truck_tonnage_per_hour', 'productivity',
+)
+
+INVALID_INPUTS = 'invalid_inputs'
+
+
+@timed('compute_studies')
+def compute_studies(scenarios, catalog=None):
+    """
+    Vectorized compute_study over many scenarios.
+
+    ``scenarios`` is a DataFrame (or dict of columns) with the StudyInputs
+    fields; ``select_bhc``, ``truck_brand`` and ``truck_model`` are optional.
+    Returns a DataFrame of the input columns plus STUDY_COLUMNS. Rows that
+    compute_study would reject or report as unmatched get the matching status
+    and NaN figures instead of raising, so one bad row never sinks a batch.
+    No scenarios give an empty DataFrame.
+    """
+    import numpy as np
+    import pandas as pd
+
+    catalog = catalog or get_catalog()
+    swl_index = catalog.swl_index
+    frame = pd.DataFrame(scenarios).reset_index(drop=True)
+    count = len(frame)
+    if 'select_bhc' not in frame:
+        frame['select_bhc'] = False
+    for column in ('truck_brand', 'truck_model'):
+        if column not in frame:
+            frame[column] = ''
+    if not count:
+        # No scenarios (an empty list has no columns at all): the empty table with every column
+        missing = [field.name for field in fields(StudyInputs) if field.name not in frame]
+        return frame.reindex(columns=[*frame.columns, *missing, *STUDY_COLUMNS])
+
+    # Keyed SWL lookup per row; dict hits are far cheaper than any column scan
+    configs = zip(*(frame[name].tolist() for name in ('make', 'model', 'boom_length', 'arm_length',
+                                                      'cwt', 'shoe_width')))
+    exact = swl_index.exact
+    found_swl = [(exact.get(config) or {}).get(reach) for config, reach in zip(configs, frame['reach'].tolist())]
+    # Same test as compute_study: no chart row or a zero load is no match, an 'N/A' load is a match
+    # that no bucket can satisfy
+    matched = np.array([bool(value) for value in found_swl], dtype=bool)
+    swl = np.array([np.nan if value is None else value for value in found_swl], dtype=float)
+    excavator_class = np.array([swl_index.classes.get(model, np.nan) for model in frame['model'].tolist()],
+                               dtype=float)
+
+    density = frame['material_density'].to_numpy(dtype=float)
+    hitch = frame['quick_hitch_weight'].to_numpy(dtype=float)
+    current_size = frame['current_bucket_size'].to_numpy(dtype=float)
+    current_weight = frame['current_bucket_weight'].to_numpy(dtype=float)
+    truck = frame['dump_truck_payload'].to_numpy(dtype=float) * 1000
+    swing_rate = frame['machine_swings_per_minute'].to_numpy(dtype=float)
+    # A blank cell (NaN) is no BHC, as in scenario_studies; NaN alone would cast to True
+    bhc = frame['select_bhc'].fillna(False).astype(bool).to_numpy()
+
+    valid = (density > 0) & (current_size > 0) & (truck > 0) & (swing_rate > 0)
+
+    # Bucket choice, one engine call per bucket catalog
+    bucket_name = np.full(count, None, dtype=object)
+    bucket_size = np.full(count, np.nan)
+    total_bucket_weight = np.full(count, np.nan)
+    for use_bhc, buckets in ((False, catalog.bucket_table), (True, catalog.bhc_bucket_table)):
+        rows = np.flatnonzero((bhc == use_bhc) & valid & matched)
+        if not rows.size:
+            continue
+        choice, total = select_optimal_buckets(buckets, swl[rows], density[rows], hitch[rows],
+                                               excavator_class[rows])
+        found = choice >= 0
+        bucket_name[rows[found]] = buckets.bucket_name[choice[found]]
+        bucket_size[rows[found]] = buckets.bucket_size[choice[found]]
+        total_bucket_weight[rows[found]] = total[found]
+
+    ok = valid & ~np.isnan(bucket_size)
+    status = np.where(~valid, INVALID_INPUTS,
+                      np.where(~matched, NO_MATCHING_CONFIGURATION,
+                               np.where(ok, OK, NO_SUITABLE_BUCKET)))
+
+    old = loadout_metrics(np.where(ok, current_size, np.nan), density, truck, swing_rate)
+    new = loadout_metrics(bucket_size, density, truck, swing_rate)
+
+    result = frame.assign(
+        status=status,
+        swl=swl,
+        bucket_name=bucket_name,
+        bucket_size=bucket_size,
+        total_bucket_weight=total_bucket_weight,
+        old_total_load=np.where(ok, old.bucket_payload + current_weight + hitch, np.nan),
+        old_truck_payload=old.truck_payload,
+        new_truck_payload=new.truck_payload,
+        old_swings_to_fill_truck=old.swings_to_fill_truck,
+        new_swings_to_fill_truck=new.swings_to_fill_truck,
+        old_avg_trucks_per_hour=old.avg_trucks_per_hour,
+        new_avg_trucks_per_hour=new.avg_trucks_per_hour,
+        old_truck_tonnage_per_hour=old.truck_tonnage_per_hour,
+        new_truck_tonnage_per_hour=new.truck_tonnage_per_hour,
+        productivity=productivity_gain(old.total_tonnage_per_hour, new.total_tonnage_per_hour),
+    )
+    return result
@@ -0,0 +1,245 @@
+"""
+Vectorized calculation engines.
+
+Each engine takes NumPy arrays (or scalars, which broadcast) and evaluates
+every scenario in one pass. xmor/core.py builds on them: compute_study calls
+them with one scenario's scalars, and compute_studies and sweep_reaches with
+whole columns.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+# Buckets up to this many class points above the machine class may be fitted
+CLASS_TOLERANCE = 10
+
+# Pass matching: the truck may be loaded up to 10% over its rated payload, in
+# 0.1% steps, to land within 0.05 of a whole number of swings
+PAYLOAD_ALLOWANCE = 0.10
+PAYLOAD_STEP = 0.001
+SWING_TOLERANCE = 0.05
+
+# Share of each hour the loadout actually runs, and the cycle time gain
+# credited to the XMOR® bucket in the headline productivity figure
+LOADOUT_EFFICIENCY = 0.75
+CYCLE_TIME_IMPROVEMENT = 1.1
+
+# Swing count used for the side-by-side volume/tonnage simulation
+SIMULATED_SWINGS = 1000
+
+# Scenarios evaluated per block, bounds the scenario x bucket temporary arrays
+CHUNK_SIZE = 65536
+
+
+# Function to calculate bucket load
+def calculate_bucket_load(bucket_size, material_density):
+    return bucket_size * material_density
+
+
+class BucketTable:
+    """
+    Column arrays for one bucket catalog, ordered largest bucket first.
+
+    The sort is stable, so among equal sizes the earlier CSV row comes first,
+    matching the row loop that only replaced its pick on a strictly larger size.
+    ``rows`` maps each sorted position back to the row in the source DataFrame,
+    and ``positions`` each bucket name to its (first) sorted position.
+    """
+
+    __slots__ = ('rows', 'bucket_size', 'bucket_weight', 'bucket_class', 'bucket_name', 'positions')
+
+    def __init__(self, bucket_data):
+        bucket_size = bucket_data['bucket_size'].to_numpy(dtype=float)
+        order = np.argsort(-bucket_size, kind='stable')
+        self.rows = order
+        self.bucket_size = bucket_size[order]
+        self.bucket_weight = bucket_data['bucket_weight'].to_numpy(dtype=float)[order]
+        self.bucket_class = bucket_data['class'].to_numpy(dtype=float)[order]
+        self.bucket_name = bucket_data['bucket_name'].to_numpy(dtype=object)[order]
+        self.positions = {}
+        for position, name in enumerate(self.bucket_name.tolist()):
+            self.positions.setdefault(name, position)
+
+    def __len__(self):
+        return len(self.bucket_size)
+
+
+def select_optimal_buckets(buckets, swl, material_density, quick_hitch_weight, excavator_class):
+    """
+    Largest bucket that each scenario can carry.
+
+    A bucket qualifies when its class is within CLASS_TOLERANCE of the machine
+    class and quick hitch + bucket load + bucket weight is within the SWL.
+    Inputs broadcast against each other. Returns ``(choice, total_bucket_weight)``
+    arrays of the broadcast shape, where ``choice`` indexes the sorted
+    BucketTable (-1 when nothing fits, with NaN total weight).
+    """
+    swl, density, hitch, machine_class = np.broadcast_arrays(
+        np.asarray(swl, dtype=float),
+        np.asarray(material_density, dtype=float),
+        np.asarray(quick_hitch_weight, dtype=float),
+        np.asarray(excavator_class, dtype=float),
+    )
+    shape = swl.shape
+    swl, density, hitch, machine_class = (a.ravel() for a in (swl, density, hitch, machine_class))
+
+    choice = np.full(swl.shape, -1, dtype=np.intp)
+    total_weight = np.full(swl.shape, np.nan)
+    if len(buckets) == 0:
+        return choice.reshape(shape), total_weight.reshape(shape)
+
+    for start in range(0, len(swl), CHUNK_SIZE):
+        block = slice(start, start + CHUNK_SIZE)
+        # Same addition order as the old row loop so totals are bit-identical
+        total = (hitch[block, None] + calculate_bucket_load(buckets.bucket_size, density[block, None])
+                 + buckets.bucket_weight)
+        feasible = ((buckets.bucket_class <= machine_class[block, None] + CLASS_TOLERANCE)
+                    & (total <= swl[block, None])
+                    & (buckets.bucket_size > 0))
+
+        # Buckets are sorted largest first, so the first feasible column is the pick
+        first = feasible.argmax(axis=1)
+        found = feasible[np.arange(len(first)), first]
+        choice[block] = np.where(found, first, -1)
+        total_weight[block] = np.where(found, total[np.arange(len(first)), first], np.nan)
+
+    return choice.reshape(shape), total_weight.reshape(shape)
+
+
+def match_passes(dump_truck_payload, bucket_payload):
+    """
+    Smallest truck payload adjustment that makes the swing count (nearly) whole.
+
+    Equivalent to stepping the payload up from the rated value in PAYLOAD_STEP
+    increments until payload / bucket_payload is within SWING_TOLERANCE below
+    a whole number, giving up at PAYLOAD_ALLOWANCE over rated. Instead of
+    stepping, the first step into each whole-number window is computed
+    directly, so the cost no longer depends on how far the payload moves.
+
+    Inputs broadcast against each other, e.g. trucks[:, None] against
+    buckets[None, :] matches every truck with every bucket. Returns
+    ``(payload, swings)`` arrays; where no step fits the rated payload and its
+    unadjusted swing count are returned.
+
+    The old loop accumulated ``payload += increment``, so whether its final
+    +10% step was tried depended on float rounding; here that step is always
+    allowed. Every other result agrees with the loop to within one increment.
+    benchmarks/match_passes_check.py compares the two.
+    """
+    truck, bucket = np.broadcast_arrays(np.asarray(dump_truck_payload, dtype=float),
+                                        np.asarray(bucket_payload, dtype=float))
+    shape = truck.shape
+    truck, bucket = truck.ravel(), bucket.ravel()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = truck / bucket
+        # Swings added by each payload step
+        swing_step = ratio * PAYLOAD_STEP
+    increment = truck * PAYLOAD_STEP
+    max_payload = truck * (1 + PAYLOAD_ALLOWANCE)
+
+    payload = truck.copy()
+    swings = ratio.copy()
+
+    def fits(active, steps):
+        candidate = truck[active] + steps * increment[active]
+        candidate_swings = candidate / bucket[active]
+        ok = ((steps >= 0) & (candidate <= max_payload[active])
+              & (np.ceil(candidate_swings) - candidate_swings <= SWING_TOLERANCE))
+        return ok, candidate, candidate_swings
+
+    # Whole swing count whose window [n - tolerance, n] is tried next
+    target = np.ceil(ratio)
+    active = np.flatnonzero(np.isfinite(ratio))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        while active.size:
+            n = target[active]
+            first_step = np.ceil((n - SWING_TOLERANCE - ratio[active]) / swing_step[active])
+            first_step = np.maximum(np.nan_to_num(first_step, nan=0.0, posinf=np.inf, neginf=0.0), 0)
+
+            # Neighbouring steps guard against rounding in the closed form
+            hit = np.zeros(active.size, dtype=bool)
+            for offset in (-1, 0, 1):
+                ok, candidate, candidate_swings = fits(active, first_step + offset)
+                ok &= ~hit
+                payload[active[ok]] = candidate[ok]
+                swings[active[ok]] = candidate_swings[ok]
+                hit |= ok
+
+            # Move on to the next whole number while its window is still inside the allowance
+            target[active] = n + 1
+            remaining = active[~hit]
+            reachable = target[remaining] - SWING_TOLERANCE <= max_payload[remaining] / bucket[remaining]
+            active = remaining[reachable]
+
+    return payload.reshape(shape), swings.reshape(shape)
+
+
+@dataclass(slots=True)
+class Loadout:
+    """Loadout figures for one bucket; fields are arrays of the broadcast input shape."""
+    bucket_payload: np.ndarray
+    truck_payload: np.ndarray
+    swings_to_fill_truck: np.ndarray
+    time_to_fill_truck: np.ndarray
+    avg_trucks_per_hour: np.ndarray
+    swings_per_hour: np.ndarray
+    truck_tonnage_per_hour: np.ndarray
+    total_tonnage_per_hour: np.ndarray
+    tonnage_per_hour: np.ndarray
+    total_m3_per_day: np.ndarray
+    total_tonnage_per_day: np.ndarray
+    total_trucks_per_day: np.ndarray
+
+
+def loadout_metrics(bucket_size, material_density, dump_truck_payload, machine_swings_per_minute,
+                    efficiency=LOADOUT_EFFICIENCY, matched=None):
+    """
+    Truck loading figures for a bucket of ``bucket_size`` m³.
+
+    ``dump_truck_payload`` is the rated payload in kg. Inputs broadcast, so
+    one call can cover a whole grid of buckets, densities, trucks and swing
+    rates. ``efficiency`` may itself be an array of per-scenario factors.
+    ``matched`` is an already computed ``match_passes`` result for the same
+    payloads, which pass matching doesn't depend on the swing rate for.
+    """
+    bucket_size = np.asarray(bucket_size, dtype=float)
+    material_density = np.asarray(material_density, dtype=float)
+    machine_swings_per_minute = np.asarray(machine_swings_per_minute, dtype=float)
+
+    bucket_payload = calculate_bucket_load(bucket_size, material_density)
+    truck_payload, swings_to_fill_truck = matched or match_passes(dump_truck_payload, bucket_payload)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Time to fill truck in minutes
+        time_to_fill_truck = swings_to_fill_truck / machine_swings_per_minute
+
+        # Average number of trucks per hour at the loadout efficiency
+        avg_trucks_per_hour = np.where(time_to_fill_truck > 0, (60 / time_to_fill_truck) * efficiency, 0.0)
+
+        swings_per_hour = swings_to_fill_truck * avg_trucks_per_hour
+        total_swings_per_hour = 60 * machine_swings_per_minute
+
+        # Truck tonnes per hour, and what the machine could move swinging flat out
+        truck_tonnage_per_hour = swings_per_hour * bucket_size * material_density / 1000
+        total_tonnage_per_hour = total_swings_per_hour * bucket_size * material_density / 1000
+        tonnage_per_hour = avg_trucks_per_hour * truck_payload / 1000
+
+        # Fixed number of swings
+        total_m3_per_day = SIMULATED_SWINGS * bucket_size
+        total_tonnage_per_day = total_m3_per_day * material_density / 1000
+        total_trucks_per_day = total_tonnage_per_day / np.asarray(dump_truck_payload, dtype=float) * 1000
+
+    return Loadout(bucket_payload, truck_payload, swings_to_fill_truck, time_to_fill_truck,
+                   avg_trucks_per_hour, swings_per_hour, truck_tonnage_per_hour,
+                   total_tonnage_per_hour, tonnage_per_hour, total_m3_per_day,
+                   total_tonnage_per_day, total_trucks_per_day)
+
+
+def productivity_gain(old_total_tonnage_per_hour, new_total_tonnage_per_hour,
+                      cycle_time_improvement=CYCLE_TIME_IMPROVEMENT):
+    """Headline productivity improvement in percent."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return ((cycle_time_improvement * new_total_tonnage_per_hour - old_total_tonnage_per_hour)
+                / old_total_tonnage_per_hour * 100)
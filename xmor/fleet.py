@@ -0,0 +1,294 @@
+"""
+Site fleet uploads: many machines from one spreadsheet, compared side by side.
+
+A site's fleet list (CSV or XLSX) has one row per machine with its
+configuration, reach, current bucket, quick hitch, truck and swing rate.
+``read_fleet`` loads it and maps the usual header spellings onto the
+StudyInputs fields; ``validate_fleet`` checks every row against the catalog
+at once and says what is wrong with each one; ``run_fleet`` computes all of
+them through ``compute_studies`` in chunks, reporting progress as it goes;
+``site_totals`` adds the results up for the whole site. ``study_fleet`` does
+all of it for an uploaded file's bytes, memoized on their digest so page
+reruns don't read and compute the same file again.
+
+Rows that fail validation are still computed, and come back with
+compute_studies' status (invalid inputs, no matching configuration) instead
+of figures, so one bad row never holds up the rest of the site. Columns other
+than the StudyInputs fields (a fleet number, a pit name) are carried through
+to the results unchanged. Reading .xlsx files needs openpyxl, and .xls files xlrd.
+"""
+
+import hashlib
+import io
+import os
+
+import numpy as np
+
+from xmor.catalog import get_catalog
+from xmor.core import OK, compute_studies
+from xmor.index import USER_DATA_KEYS
+from xmor.memo import stage_cache
+from xmor.timing import timed
+
+# Rows per compute_studies call, i.e. between progress reports
+FLEET_CHUNK_ROWS = 2000
+
+# Header spellings accepted for each StudyInputs field, after lower-casing and
+# turning spaces and dashes into underscores
+COLUMN_ALIASES = {
+    'make': ('excavator_make', 'manufacturer'),
+    'model': ('excavator_model',),
+    'boom_length': ('boom', 'boom_m'),
+    'arm_length': ('arm', 'stick', 'stick_length', 'arm_m'),
+    'cwt': ('counterweight', 'counterweight_kg'),
+    'shoe_width': ('shoe', 'shoe_width_mm', 'track_shoe_width'),
+    'reach': ('reach_m', 'working_reach'),
+    'material_density': ('density', 'material_density_kg_m3'),
+    'quick_hitch_weight': ('quick_hitch', 'hitch_weight', 'quick_hitch_kg'),
+    'current_bucket_size': ('bucket_size', 'current_bucket_m3', 'bucket_m3'),
+    'current_bucket_weight': ('bucket_weight', 'current_bucket_kg', 'bucket_kg'),
+    'dump_truck_payload': ('truck_payload', 'payload', 'rated_payload'),
+    'machine_swings_per_minute': ('swings_per_minute', 'swing_rate', 'swings_min'),
+    'select_bhc': ('bhc', 'heavy_duty'),
+    'truck_brand': ('truck_make',),
+    'truck_model': ('truck',),
+}
+
+NUMERIC_COLUMNS = ('boom_length', 'arm_length', 'cwt', 'shoe_width', 'reach', 'material_density',
+                   'quick_hitch_weight', 'current_bucket_size', 'current_bucket_weight', 'dump_truck_payload',
+                   'machine_swings_per_minute')
+
+# Must be present in the file; density, quick hitch and BHC fall back to defaults, and
+# the truck payload can come from the truck model
+REQUIRED_COLUMNS = USER_DATA_KEYS + ('reach', 'current_bucket_size', 'current_bucket_weight',
+                                     'machine_swings_per_minute')
+
+# Values compute_study divides by
+POSITIVE_COLUMNS = ('material_density', 'current_bucket_size', 'dump_truck_payload', 'machine_swings_per_minute')
+
+_TRUE = ('1', 'true', 'yes', 'y', 'bhc')
+
+# Uploaded fleets kept, by file digest, density and catalog version
+_fleet_stage = stage_cache('fleet', maxsize=8)
+
+
+def _normalize(header):
+    return str(header).strip().lower().replace(' ', '_').replace('-', '_')
+
+
+def read_fleet(source, filename=None):
+    """
+    The fleet in ``source`` (a path or file object) as a DataFrame with StudyInputs column names.
+
+    The format follows the file name's extension (``filename`` for file
+    objects, such as a Streamlit upload): .xlsx/.xls reads the first sheet,
+    anything else is read as CSV. Raises ValueError for a file that can't be
+    read.
+    """
+    import pandas as pd
+
+    name = filename or (source if isinstance(source, (str, os.PathLike)) else getattr(source, 'name', ''))
+    try:
+        if str(name).lower().endswith(('.xlsx', '.xlsm', '.xls')):
+            frame = pd.read_excel(source)
+        else:
+            frame = pd.read_csv(source, skipinitialspace=True)
+    except ImportError:
+        # pandas reads legacy .xls workbooks through xlrd, everything newer through openpyxl
+        engine = 'xlrd' if str(name).lower().endswith('.xls') else 'openpyxl'
+        raise ValueError(f"Reading {name or 'Excel fleet files'} needs {engine}; install it or upload a CSV")
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+        raise ValueError(f"Could not read {name or 'the fleet file'}: {e}")
+
+    renames = {}
+    lookup = {_normalize(alias): field for field, aliases in COLUMN_ALIASES.items() for alias in (field,) + aliases}
+    for column in frame.columns:
+        field = lookup.get(_normalize(column))
+        # First column claiming a field wins; later ones keep their own name
+        if field is not None and field not in renames.values():
+            renames[column] = field
+    # Blank rows go, keeping each row's index so it still points at its line in the file
+    return frame.rename(columns=renames).dropna(how='all')
+
+
+@timed('fleet_validation')
+def validate_fleet(frame, material_density=None, quick_hitch_weight=0.0, catalog=None):
+    """
+    ``(scenarios, issues)`` for a read_fleet frame, every row checked at once.
+
+    ``scenarios`` is ``frame`` with typed StudyInputs columns ready for
+    compute_studies: numbers coerced (unreadable values become NaN), the
+    density and quick hitch filled from the arguments where the file has
+    none, and missing truck payloads looked up from the truck model in
+    dump_trucks.csv. ``issues`` holds one string per row, empty when the row
+    is fine. Raises ValueError when required columns are missing altogether.
+    """
+    import pandas as pd
+
+    catalog = catalog or get_catalog()
+    scenarios = frame.copy()
+    required = list(REQUIRED_COLUMNS)
+    if 'material_density' not in scenarios and material_density is None:
+        required.append('material_density')
+    if 'dump_truck_payload' not in scenarios and 'truck_model' not in scenarios:
+        required.append('dump_truck_payload or truck_model')
+    missing = [name for name in required if name not in scenarios]
+    if missing:
+        raise ValueError(f"Fleet file is missing column{'s' if len(missing) > 1 else ''}: {', '.join(missing)}")
+
+    count = len(scenarios)
+    problems = [[] for _ in range(count)]
+
+    def flag(mask, message):
+        for row in np.flatnonzero(mask):
+            problems[row].append(message)
+
+    for name, default in (('material_density', material_density), ('quick_hitch_weight', quick_hitch_weight)):
+        if name not in scenarios:
+            scenarios[name] = default
+        elif default is not None:
+            scenarios[name] = scenarios[name].where(scenarios[name].notna(), default)
+    for name in ('make', 'model', 'truck_brand', 'truck_model'):
+        if name not in scenarios:
+            scenarios[name] = ''
+        scenarios[name] = scenarios[name].fillna('').astype(str).str.strip()
+    if 'dump_truck_payload' not in scenarios:
+        scenarios['dump_truck_payload'] = np.nan
+    bhc = scenarios['select_bhc'] if 'select_bhc' in scenarios else pd.Series(False, index=scenarios.index)
+    scenarios['select_bhc'] = bhc.map(lambda value: str(value).strip().lower() in _TRUE)
+
+    # Truck payload from the truck model where the file gives none
+    looked_up = scenarios['truck_model'].map(catalog.truck_payloads)
+    no_payload = pd.to_numeric(scenarios['dump_truck_payload'], errors='coerce').isna()
+    unknown_truck = no_payload & (scenarios['truck_model'] != '') & looked_up.isna()
+    flag(unknown_truck, "unknown truck model")
+    scenarios['dump_truck_payload'] = scenarios['dump_truck_payload'].where(~no_payload, looked_up)
+
+    for name in NUMERIC_COLUMNS:
+        given = scenarios[name].notna() & (scenarios[name].astype(str).str.strip() != '')
+        scenarios[name] = pd.to_numeric(scenarios[name], errors='coerce').astype(float)
+        label = name.replace('_', ' ')
+        flag(given & scenarios[name].isna(), f"{label} is not a number")
+        if name == 'dump_truck_payload':
+            flag(~given & ~unknown_truck & scenarios[name].isna(), "no truck payload or model")
+        elif name != 'quick_hitch_weight':
+            flag(~given, f"{label} is missing")
+    for name in POSITIVE_COLUMNS:
+        flag(scenarios[name] <= 0, f"{name.replace('_', ' ')} must be greater than zero")
+    flag(scenarios['make'] == '', "make is missing")
+    flag(scenarios['model'] == '', "model is missing")
+
+    # Same keyed lookups as compute_studies, telling an unknown configuration from an untabulated reach;
+    # rows with a blank or unreadable configuration value are already flagged
+    exact = catalog.swl_index.exact
+    configs = zip(*(scenarios[name].tolist() for name in USER_DATA_KEYS))
+    charts = [exact.get(config) for config in configs]
+    complete = scenarios[list(USER_DATA_KEYS[2:])].notna().all(axis=1).to_numpy() & (scenarios['model'] != '').to_numpy()
+    flag(complete & np.array([chart is None for chart in charts], dtype=bool), "configuration not in the load chart")
+    flag(scenarios['reach'].notna().to_numpy()
+         & np.array([chart is not None and reach not in chart
+                     for chart, reach in zip(charts, scenarios['reach'].tolist())], dtype=bool),
+         "reach not tabulated for this configuration")
+
+    issues = pd.Series(['; '.join(messages) for messages in problems], index=scenarios.index, dtype=object)
+    return scenarios, issues
+
+
+@timed('fleet_studies')
+def run_fleet(scenarios, catalog=None, progress=None, chunk_rows=FLEET_CHUNK_ROWS):
+    """
+    compute_studies over a validated fleet, ``chunk_rows`` at a time.
+
+    ``progress(done, total)`` is called after each chunk. Returns the
+    compute_studies frame for all rows, in file order.
+    """
+    import pandas as pd
+
+    catalog = catalog or get_catalog()
+    total = len(scenarios)
+    chunks = []
+    for start in range(0, total, chunk_rows):
+        chunks.append(compute_studies(scenarios.iloc[start:start + chunk_rows], catalog))
+        if progress is not None:
+            progress(min(start + chunk_rows, total), total)
+    if not chunks:
+        return compute_studies(scenarios, catalog)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def study_fleet(data, filename, material_density=None, catalog=None, progress=None):
+    """
+    ``(results, issues)`` for the fleet file in ``data`` (bytes): read, validated and run.
+
+    Memoized on the file's SHA-1, its name, the default density and the
+    catalog version; ``progress`` is only called when the fleet is computed.
+    Raises ValueError when the file can't be read or lacks required columns.
+    """
+    catalog = catalog or get_catalog()
+    key = (hashlib.sha1(data).hexdigest(), filename, material_density, catalog.version)
+
+    def compute():
+        scenarios, issues = validate_fleet(read_fleet(io.BytesIO(data), filename), material_density,
+                                           catalog=catalog)
+        return run_fleet(scenarios, catalog, progress), issues
+
+    return _fleet_stage.get(key, compute)
+
+
+def site_totals(results):
+    """
+    Site-wide sums over the rows that computed: machines, trucks/hour and truck tonnes/hour
+    for the current and the XMOR® buckets, and the site's gain in tonnes/hour.
+    """
+    ok = (results['status'] == OK).to_numpy()
+    old_tonnes = float(results['old_truck_tonnage_per_hour'][ok].sum())
+    new_tonnes = float(results['new_truck_tonnage_per_hour'][ok].sum())
+    return {
+        'machines': len(results),
+        'computed': int(ok.sum()),
+        'old_trucks_per_hour': float(results['old_avg_trucks_per_hour'][ok].sum()),
+        'new_trucks_per_hour': float(results['new_avg_trucks_per_hour'][ok].sum()),
+        'old_tonnage_per_hour': old_tonnes,
+        'new_tonnage_per_hour': new_tonnes,
+        'tonnage_gain': (new_tonnes - old_tonnes) / old_tonnes * 100 if old_tonnes else float('nan'),
+        'statuses': results['status'].value_counts().to_dict(),
+    }
+
+
+def site_table(totals):
+    """{column header: [cell, ...]} of site_totals, in the page's table format."""
+    old_trucks, new_trucks = totals['old_trucks_per_hour'], totals['new_trucks_per_hour']
+    old_tonnes, new_tonnes = totals['old_tonnage_per_hour'], totals['new_tonnage_per_hour']
+    return {
+        'Description': ["Machines Compared", "Trucks Loaded/Hour", "Truck Tonnes/Hour"],
+        'Old Buckets': [f"{totals['computed']} of {totals['machines']}", f"{old_trucks:,.1f}", f"{old_tonnes:,.0f}"],
+        'XMOR® Buckets': [f"{totals['computed']} of {totals['machines']}", f"{new_trucks:,.1f}", f"{new_tonnes:,.0f}"],
+        'Difference': ["", f"{new_trucks - old_trucks:+,.1f}", f"{new_tonnes - old_tonnes:+,.0f}"],
+        '% Difference': ["", f"{(new_trucks - old_trucks) / old_trucks * 100:.0f}%" if old_trucks else "-",
+                         f"{totals['tonnage_gain']:.0f}%" if old_tonnes else "-"],
+    }
+
+
+def fleet_table(results, issues):
+    """Per-machine comparison frame for display, one row per fleet row in file order."""
+    import pandas as pd
+
+    ok = (results['status'] == OK).to_numpy()
+
+    def figure(column, digits):
+        return results[column].where(ok).round(digits)
+
+    return pd.DataFrame({
+        # File line of each row, under the header
+        'Row': issues.index.to_numpy() + 2,
+        'Machine': (results['make'].astype(str) + ' ' + results['model'].astype(str)).to_numpy(),
+        'Reach (m)': results['reach'].to_numpy(),
+        'Current Bucket (m³)': results['current_bucket_size'].to_numpy(),
+        'XMOR® Bucket': results['bucket_name'].where(ok, '').to_numpy(),
+        'XMOR® Size (m³)': figure('bucket_size', 2).to_numpy(),
+        'Old Tonnes/Hour': figure('old_truck_tonnage_per_hour', 0).to_numpy(),
+        'XMOR® Tonnes/Hour': figure('new_truck_tonnage_per_hour', 0).to_numpy(),
+        'Productivity Improvement (%)': figure('productivity', 0).to_numpy(),
+        'Status': results['status'].str.replace('_', ' ').to_numpy(),
+        'Issues': issues.to_numpy(),
+    })
@@ -0,0 +1,71 @@
+"""
+Pre-decoded, display-sized product images.
+
+Each source PNG is decoded once per (file version, display width), resized to
+that width and re-encoded (JPEG when the image has no real transparency,
+optimized PNG otherwise). Streamlit serves bytes that already fit the
+requested width and format as-is, so showing an image after Calculate no
+longer costs a PNG decode and re-encode per request.
+
+A bucket can have its own picture at bucket_images/<bucket_name>.png (or .jpg);
+otherwise its product family image is used.
+"""
+
+import io
+import os
+import threading
+from functools import lru_cache
+
+from xmor.catalog import DATA_DIR
+from xmor.timing import timed
+
+FAMILY_IMAGES = {
+    'BHB': 'XMOR_BHB_IMAGE.png',
+    'BHC': 'XMOR_BHC_IMAGE.png',
+}
+BUCKET_IMAGE_DIR = os.path.join(DATA_DIR, 'bucket_images')
+_BUCKET_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+JPEG_QUALITY = 85
+
+# Pillow decoders aren't guaranteed thread-safe; sessions run on threads
+_decode_lock = threading.Lock()
+
+
+def image_path(bucket_name, family):
+    """Source file for a bucket: its own image if one exists, else the family image."""
+    for extension in _BUCKET_IMAGE_EXTENSIONS:
+        path = os.path.join(BUCKET_IMAGE_DIR, bucket_name + extension)
+        if os.path.isfile(path):
+            return path
+    return os.path.join(DATA_DIR, FAMILY_IMAGES[family])
+
+
+@lru_cache(maxsize=256)
+def _render(path, mtime_ns, width):
+    # mtime_ns is only part of the cache key, so a replaced file is re-rendered
+    from PIL import Image
+
+    with _decode_lock, Image.open(path) as image:
+        image.load()
+        # Palette and greyscale images (LA, or P with a transparency key) would lose their alpha
+        # below and resample poorly as they are, so everything is resized as RGBA or RGB
+        image = image.convert('RGBA' if image.has_transparency_data else 'RGB')
+        if image.width > width:
+            height = round(image.height * width / image.width)
+            image = image.resize((width, height), Image.LANCZOS)
+
+        output = io.BytesIO()
+        opaque = image.mode == 'RGB' or image.getextrema()[3][0] == 255
+        if opaque:
+            image.convert('RGB').save(output, format='JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        else:
+            image.save(output, format='PNG', optimize=True)
+    return output.getvalue()
+
+
+@timed('image')
+def bucket_image(bucket_name, family, width=400):
+    """Encoded image bytes for a bucket at ``width`` pixels, from the cache after the first call."""
+    path = image_path(bucket_name, family)
+    return _render(path, os.stat(path).st_mtime_ns, width)
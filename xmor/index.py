@@ -0,0 +1,215 @@
+"""
+Lookup structures built once from the SWL load chart.
+
+These are derived from the cached catalog (see ``Catalog.derive``) and are
+rebuilt only when ``excavator_swl.csv`` itself changes.
+"""
+
+import numpy as np
+
+# Selector cascade order, matching the st.selectbox steps in Ez6060.py
+SELECTOR_LEVELS = ('make', 'model', 'boom_length', 'arm_length', 'CWT', 'shoe_width', 'reach')
+
+# A machine configuration is everything above reach
+CONFIG_LEVELS = SELECTOR_LEVELS[:-1]
+
+# user_data keys for each configuration level (user_data says 'cwt', the CSV 'CWT')
+USER_DATA_KEYS = ('make', 'model', 'boom_length', 'arm_length', 'cwt', 'shoe_width')
+
+# Coerced blanks ('Max', 'N/A') come through as NaN, which never equals itself.
+# Folding them onto one shared object keeps a single 'nan' option per level,
+# the same as Series.unique() did.
+_NAN = float('nan')
+
+def _key(value):
+    return _NAN if value != value else value
+
+
+class SelectorIndex:
+    """
+    Nested dicts make -> model -> boom -> arm -> CWT -> shoe -> reach -> row.
+
+    Options at each level keep the first-seen order of the CSV, so the cascade
+    shows exactly what the chained ``.unique()`` calls used to, without
+    building a mask or copying a DataFrame per level.
+    """
+
+    __slots__ = ('root',)
+
+    def __init__(self, swl_data):
+        root = {}
+        columns = [swl_data[level].tolist() for level in SELECTOR_LEVELS]
+        for position, row in enumerate(zip(*columns)):
+            node = root
+            for value in row[:-1]:
+                node = node.setdefault(_key(value), {})
+            # First matching row wins, as with .iloc[0] in find_matching_swl
+            node.setdefault(_key(row[-1]), position)
+        self.root = root
+
+    def _node(self, path):
+        node = self.root
+        for value in path:
+            node = node.get(_key(value))
+            if node is None:
+                return None
+        return node
+
+    def options(self, *path):
+        """Valid values for the level after ``path`` (e.g. options(make, model) -> booms)."""
+        node = self._node(path)
+        return list(node) if node is not None else []
+
+    def row(self, *path):
+        """Positional row in swl_data for a full seven-level selection, or None."""
+        if len(path) != len(SELECTOR_LEVELS):
+            raise ValueError(f"Expected {len(SELECTOR_LEVELS)} selector values, got {len(path)}")
+        return self._node(path)
+
+
+def config_key(user_data):
+    """(make, model, boom, arm, CWT, shoe) tuple for a user_data dict."""
+    return tuple(_key(user_data[name]) for name in USER_DATA_KEYS)
+
+
+class SWLIndex:
+    """
+    Safe working load per machine configuration, keyed by ``config_key``.
+
+    ``exact`` maps config -> {reach: swl} for O(1) lookups of tabulated reaches
+    (first row wins, 'N/A' loads stay NaN, as before). ``curves`` holds the same
+    points as reach-sorted float arrays, restricted to rows where both reach and
+    SWL are known, for interpolating at arbitrary reaches. ``classes`` maps each
+    model to its excavator class (first row wins).
+    """
+
+    __slots__ = ('exact', 'curves', 'classes')
+
+    def __init__(self, swl_data):
+        exact = {}
+        points = {}
+        classes = {}
+        columns = [swl_data[level].tolist() for level in CONFIG_LEVELS]
+        reaches = swl_data['reach'].tolist()
+        swls = swl_data['swl'].tolist()
+        for config, reach, swl, machine_class in zip(zip(*columns), reaches, swls, swl_data['class'].tolist()):
+            config = tuple(_key(value) for value in config)
+            classes.setdefault(config[1], machine_class)
+            chart = exact.setdefault(config, {})
+            # 'Max' reach rows can never be matched exactly or placed on the curve
+            if reach != reach or reach in chart:
+                continue
+            chart[reach] = swl
+            if swl == swl:
+                points.setdefault(config, []).append((reach, swl))
+
+        curves = {}
+        for config, pairs in points.items():
+            pairs.sort()
+            curve = np.array(pairs, dtype=float)
+            curves[config] = (curve[:, 0], curve[:, 1])
+
+        self.exact = exact
+        self.curves = curves
+        self.classes = classes
+
+    def lookup(self, config, reach):
+        """SWL at a tabulated reach, or None when the configuration/reach is not in the chart."""
+        chart = self.exact.get(config)
+        if chart is None:
+            return None
+        return chart.get(reach)
+
+    def interpolate(self, config, reaches):
+        """
+        SWL at each of ``reaches`` (scalar or array), linearly interpolated
+        between neighbouring chart points.
+
+        Reaches outside the tabulated range give NaN: the chart says nothing
+        about them and extrapolating a safe working load is not safe.
+        """
+        reaches = np.asarray(reaches, dtype=float)
+        curve = self.curves.get(config)
+        if curve is None:
+            return np.full(reaches.shape, np.nan)
+        chart_reach, chart_swl = curve
+        if len(chart_reach) == 1:
+            return np.where(reaches == chart_reach[0], chart_swl[0], np.nan)
+
+        # Binary search for the chart segment each reach falls in
+        right = np.clip(np.searchsorted(chart_reach, reaches), 1, len(chart_reach) - 1)
+        left = right - 1
+        span = chart_reach[right] - chart_reach[left]
+        weight = (reaches - chart_reach[left]) / span
+        result = chart_swl[left] + weight * (chart_swl[right] - chart_swl[left])
+
+        in_range = (reaches >= chart_reach[0]) & (reaches <= chart_reach[-1])
+        return np.where(in_range, result, np.nan)
+
+
+class ReachIndex:
+    """
+    Reverse lookup over the SWL chart: which configurations can carry a load, and how far out.
+
+    For each configuration the chart points are reduced to their envelope:
+    walking in from the longest reach, keep only points whose SWL beats every
+    point further out. The longest reach that carries a load is always one of
+    those points, and along the envelope SWL rises as reach falls, so one
+    comparison per envelope point answers the query. Envelopes are padded into
+    one (configuration x point) matrix, ascending in SWL, so a query is a
+    single vectorized comparison over every configuration at once.
+
+    ``configs`` are in first-seen CSV order, with ``levels`` holding the same
+    values as one array per CONFIG_LEVELS column; ``classes`` holds each
+    one's excavator class for the bucket class check. Built from the same
+    chart points as SWLIndex.curves.
+    """
+
+    __slots__ = ('configs', 'levels', 'classes', 'swl', 'reach')
+
+    def __init__(self, swl_data):
+        swl_index = SWLIndex(swl_data)
+        configs, classes, envelopes = [], [], []
+        for config, curve in swl_index.curves.items():
+            chart_reach, chart_swl = curve
+            envelope = []
+            best = -np.inf
+            for reach, swl in zip(chart_reach[::-1], chart_swl[::-1]):
+                if swl > best:
+                    envelope.append((swl, reach))
+                    best = swl
+            configs.append(config)
+            classes.append(swl_index.classes.get(config[1], np.nan))
+            envelopes.append(envelope)
+
+        width = max((len(envelope) for envelope in envelopes), default=0)
+        # Padding sits in front with -inf SWL, so it never carries anything
+        swl = np.full((len(configs), width), -np.inf)
+        reach = np.full((len(configs), width), np.nan)
+        for row, envelope in enumerate(envelopes):
+            if envelope:
+                points = np.array(envelope, dtype=float)
+                swl[row, width - len(envelope):] = points[:, 0]
+                reach[row, width - len(envelope):] = points[:, 1]
+
+        self.configs = configs
+        self.levels = {level: np.array([config[depth] for config in configs], dtype=swl_data[level].to_numpy().dtype)
+                       for depth, level in enumerate(CONFIG_LEVELS)}
+        self.classes = np.array(classes, dtype=float)
+        self.swl = swl
+        self.reach = reach
+
+    def carriers(self, load, min_class=-np.inf):
+        """
+        ``(rows, max_reach, swl)`` for every configuration of class ``min_class``
+        or above whose chart carries ``load`` kg at some tabulated reach.
+
+        ``rows`` index ``configs``; ``max_reach`` is the longest tabulated reach
+        whose SWL is at least ``load``, and ``swl`` the SWL there.
+        """
+        carries = self.swl >= load
+        count = carries.sum(axis=1)
+        rows = np.flatnonzero((count > 0) & (self.classes >= min_class))
+        # Envelope SWL ascends along each row, so the first point that carries is the longest reach
+        column = self.swl.shape[1] - count[rows]
+        return rows, self.reach[rows, column], self.swl[rows, column]
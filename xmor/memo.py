@@ -0,0 +1,79 @@
+"""
+Per-stage memo caches for the study pipeline.
+
+``compute_study`` runs as a chain of stages (SWL -> optimal bucket -> pass
+matching -> loadouts -> tables -> result -> report), each memoized on exactly
+the values it reads rather than on the whole input. Changing the swing rate
+therefore reuses the SWL, bucket and pass matching, changing the truck reuses
+the SWL and bucket, and repeating a Calculate returns the previous result
+(and workbook) outright. Caches are process-wide, so sessions on a shared
+server also share each other's work.
+
+Cached values are shared between callers and must be treated as read-only.
+"""
+
+import threading
+from collections import OrderedDict
+
+# Entries kept per stage
+STAGE_CACHE_SIZE = 1024
+
+_caches = {}
+
+
+class StageCache:
+    """Thread-safe LRU of one stage's results, with hit/miss counts."""
+
+    __slots__ = ('name', 'maxsize', 'entries', 'hits', 'misses', '_lock')
+
+    def __init__(self, name, maxsize=STAGE_CACHE_SIZE):
+        self.name = name
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        """The cached value for ``key``, or ``compute()`` stored under it."""
+        with self._lock:
+            try:
+                value = self.entries[key]
+            except KeyError:
+                pass
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+        # Computed outside the lock; two sessions racing on one key both compute, which is harmless
+        value = compute()
+        with self._lock:
+            self.misses += 1
+            self.entries[key] = value
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+
+
+def stage_cache(name, maxsize=STAGE_CACHE_SIZE):
+    """The process-wide cache for stage ``name``, created on first use."""
+    cache = _caches.get(name)
+    if cache is None:
+        cache = _caches.setdefault(name, StageCache(name, maxsize))
+    return cache
+
+
+def cache_info():
+    """{stage: {'hits', 'misses', 'size'}} for every stage cache."""
+    return {name: {'hits': cache.hits, 'misses': cache.misses, 'size': len(cache.entries)}
+            for name, cache in _caches.items()}
+
+
+def clear_caches():
+    for cache in _caches.values():
+        cache.clear()
@@ -0,0 +1,172 @@
+"""
+Excavator-truck-bucket matching: rank every truck against every bucket that fits.
+
+For one machine configuration, reach, density and swing rate, ``rank_matches``
+scores the full cross product of dump_trucks.csv against both bucket
+catalogs and returns the top k combinations.
+
+Buckets are pruned first against the SWL envelope: the SWL at the chosen
+reach and the class tolerance decide feasibility, and neither depends on the
+truck, so only buckets the machine can carry enter the cross product. Scoring
+is one broadcast ``loadout_metrics`` call per block of trucks; blocks keep the
+truck x bucket arrays bounded and only each block's best k are kept, so the
+cost grows with the catalogs without their product ever being held at once.
+
+Combinations are ranked by matched tonnes/hour: trucks loaded per hour when
+every pass, including a partial last one, takes a full swing, times the
+matched payload. A poor pass match therefore costs a combination its rank
+directly; ties go to the smaller pass-match gap. Only combinations filling
+the truck in MIN_PASSES to MAX_PASSES passes are ranked by default, so a
+small machine is not matched to a haul truck it would take 40 passes to fill.
+"""
+
+import numpy as np
+
+from xmor.catalog import get_catalog
+from xmor.engine import CLASS_TOLERANCE, LOADOUT_EFFICIENCY, calculate_bucket_load, loadout_metrics
+from xmor.index import config_key
+from xmor.timing import timed
+
+DEFAULT_TOP_K = 10
+
+# Pass counts considered a sensible truck match; outside this a combination isn't ranked
+MIN_PASSES = 3
+MAX_PASSES = 7
+
+# Truck x bucket cells scored per block
+BLOCK_CELLS = 1 << 20
+
+RANKING_COLUMNS = [
+    'truck_brand', 'truck_type', 'truck_model', 'rated_payload', 'bucket_family', 'bucket_name',
+    'bucket_size', 'total_bucket_weight', 'swl_utilisation', 'passes', 'swings_to_fill_truck',
+    'truck_payload', 'fill_factor', 'pass_match_gap', 'trucks_per_hour', 'truck_tonnage_per_hour',
+    'matched_tonnage_per_hour',
+]
+
+
+def feasible_buckets(catalog, swl, material_density, quick_hitch_weight, excavator_class):
+    """
+    Every bucket in both catalogs that the machine can carry, as column arrays.
+
+    Same test as select_optimal_buckets, applied once per bucket instead of
+    picking the largest: class within CLASS_TOLERANCE and quick hitch + load +
+    bucket weight within the SWL.
+    """
+    columns = {'family': [], 'name': [], 'size': [], 'total_weight': []}
+    for family, buckets in (('BHB', catalog.bucket_table), ('BHC', catalog.bhc_bucket_table)):
+        total = quick_hitch_weight + calculate_bucket_load(buckets.bucket_size, material_density) + buckets.bucket_weight
+        keep = ((buckets.bucket_class <= excavator_class + CLASS_TOLERANCE) & (total <= swl)
+                & (buckets.bucket_size > 0))
+        columns['family'].append(np.full(keep.sum(), family, dtype=object))
+        columns['name'].append(buckets.bucket_name[keep])
+        columns['size'].append(buckets.bucket_size[keep])
+        columns['total_weight'].append(total[keep])
+    return {name: np.concatenate(parts) for name, parts in columns.items()}
+
+
+def _score(truck_payload, bucket_size, material_density, swing_rate, efficiency):
+    # Rows are trucks (kg), columns buckets
+    loadout = loadout_metrics(bucket_size[None, :], material_density, truck_payload[:, None], swing_rate, efficiency)
+    passes = np.ceil(loadout.swings_to_fill_truck - 1e-9)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        matched = 60 * swing_rate / passes * efficiency * loadout.truck_payload / 1000
+    return loadout, passes, matched
+
+
+@timed('rank_matches')
+def rank_matches(inputs, top_k=DEFAULT_TOP_K, min_passes=MIN_PASSES, max_passes=MAX_PASSES,
+                 efficiency=LOADOUT_EFFICIENCY, catalog=None):
+    """
+    Top ``top_k`` truck/bucket combinations for the inputs' machine and site, as a DataFrame.
+
+    ``inputs`` is a StudyInputs or user_data-style dict; its truck, current
+    bucket and BHC choice are ignored since every truck and bucket is tried.
+    Pass either pass limit as None to lift it. Returns an empty frame when the
+    configuration has no SWL at the reach or nothing fits.
+    """
+    import pandas as pd
+
+    catalog = catalog or get_catalog()
+    user_data = inputs if isinstance(inputs, dict) else inputs.to_user_data()
+    density = float(user_data['material_density'])
+    swing_rate = float(user_data['machine_swings_per_minute'])
+    if not (density > 0 and swing_rate > 0):
+        raise ValueError("Material density and swing rate must be greater than zero")
+
+    swl_index = catalog.swl_index
+    swl = swl_index.lookup(config_key(user_data), user_data['reach'])
+    if not swl:
+        return pd.DataFrame(columns=RANKING_COLUMNS)
+    buckets = feasible_buckets(catalog, swl, density, float(user_data['quick_hitch_weight']),
+                               swl_index.classes.get(user_data['model'], np.nan))
+
+    trucks = catalog.dump_truck_data
+    rated = trucks['payload'].to_numpy(dtype=float)
+    usable = np.flatnonzero(rated > 0)
+    if not len(buckets['size']) or not usable.size:
+        return pd.DataFrame(columns=RANKING_COLUMNS)
+
+    # Best k per block of trucks, then the best k of those
+    candidates = []
+    trucks_per_block = max(1, BLOCK_CELLS // len(buckets['size']))
+    for start in range(0, usable.size, trucks_per_block):
+        block = usable[start:start + trucks_per_block]
+        loadout, passes, matched = _score(rated[block] * 1000, buckets['size'], density, swing_rate, efficiency)
+        gap = passes - loadout.swings_to_fill_truck
+        allowed = np.isfinite(matched)
+        if min_passes is not None:
+            allowed &= passes >= min_passes
+        if max_passes is not None:
+            allowed &= passes <= max_passes
+        flat = np.where(allowed, matched, -np.inf).ravel()
+        keep = min(top_k, int(np.count_nonzero(allowed)))
+        if not keep:
+            continue
+        # Everything tied with the k-th best too, so the final order doesn't depend on block boundaries
+        threshold = np.partition(flat, flat.size - keep)[flat.size - keep]
+        best = np.flatnonzero(flat >= threshold)
+        truck_pos, bucket_pos = np.unravel_index(best, matched.shape)
+        candidates.append(pd.DataFrame({
+            'truck_row': block[truck_pos],
+            'bucket_pos': bucket_pos,
+            'passes': passes[truck_pos, bucket_pos],
+            'swings_to_fill_truck': loadout.swings_to_fill_truck[truck_pos, bucket_pos],
+            'truck_payload': loadout.truck_payload[truck_pos, bucket_pos],
+            'pass_match_gap': gap[truck_pos, bucket_pos],
+            'trucks_per_hour': loadout.avg_trucks_per_hour[truck_pos, bucket_pos],
+            'truck_tonnage_per_hour': loadout.truck_tonnage_per_hour[truck_pos, bucket_pos],
+            'matched_tonnage_per_hour': matched[truck_pos, bucket_pos],
+        }))
+
+    if not candidates:
+        return pd.DataFrame(columns=RANKING_COLUMNS)
+    ranked = (pd.concat(candidates, ignore_index=True)
+              .sort_values(['matched_tonnage_per_hour', 'pass_match_gap', 'truck_row', 'bucket_pos'],
+                           ascending=[False, True, True, True])
+              .head(top_k).reset_index(drop=True))
+    rows, positions = ranked['truck_row'].to_numpy(), ranked['bucket_pos'].to_numpy()
+    ranked['truck_brand'] = trucks['brand'].to_numpy()[rows]
+    ranked['truck_type'] = trucks['type'].to_numpy()[rows]
+    ranked['truck_model'] = trucks['model'].to_numpy()[rows]
+    ranked['rated_payload'] = rated[rows]
+    ranked['bucket_family'] = buckets['family'][positions]
+    ranked['bucket_name'] = buckets['name'][positions]
+    ranked['bucket_size'] = buckets['size'][positions]
+    ranked['total_bucket_weight'] = buckets['total_weight'][positions]
+    ranked['swl_utilisation'] = buckets['total_weight'][positions] / swl
+    ranked['fill_factor'] = ranked['truck_payload'] / (ranked['rated_payload'] * 1000)
+    return ranked[RANKING_COLUMNS]
+
+
+def ranking_table(ranked):
+    """{column header: [cell, ...]} of a rank_matches frame, in the page's table format."""
+    return {
+        'Rank': [str(rank) for rank in range(1, len(ranked) + 1)],
+        'Dump Truck': [f"{brand} {model} ({payload:g}t)" for brand, model, payload
+                       in zip(ranked['truck_brand'], ranked['truck_model'], ranked['rated_payload'])],
+        'XMOR® Bucket': [f"{name} ({size} m³)" for name, size in zip(ranked['bucket_name'], ranked['bucket_size'])],
+        'Passes': [f"{passes:.0f}" for passes in ranked['passes']],
+        'Fill Factor': [f"{100 * fill:.1f}%" for fill in ranked['fill_factor']],
+        'SWL Used': [f"{100 * used:.0f}%" for used in ranked['swl_utilisation']],
+        'Tonnes/Hour': [f"{tonnes:.0f}" for tonnes in ranked['matched_tonnage_per_hour']],
+    }
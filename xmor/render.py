@@ -0,0 +1,97 @@
+"""HTML rendering of the comparison tables for the Streamlit page."""
+
+from xmor.timing import timed
+
+
+@timed('html_render')
+def generate_html_table(data, title):
+    """
+    Generate a simple HTML table from a dictionary where keys are column headers
+    and values are lists of data. The table will have a dynamic title, styled for dark mode.
+    """
+    # Extract headers dynamically from the keys of the data dictionary
+    headers = list(data.keys())
+    
+    # Find the maximum length of the lists (rows) in the data dictionary
+    num_rows = max(len(data[header]) for header in headers)
+    
+    # Start the HTML table structure with fixed table width
+    html = """
+    <style>
+        /* Global styles for Dark Mode */
+        body {
+            background-color: #121212; /* Dark background for the body */
+            color: #e0e0e0; /* Light text for dark mode */
+            font-family: Arial, sans-serif;
+            margin: 0;
+            padding: 20px;
+        }
+        table {
+            width: 100%; /* Set a fixed width for the table */
+            margin: 0 auto; /* Center the table horizontally */
+            border-collapse: collapse;
+            font-size: 16px;
+            text-align: left;
+            background-color: #1e1e1e; /* Table background for dark mode */
+            color: #e0e0e0; /* Light text for table content */
+            border-radius: 8px; /* Rounded corners for modern look */
+        }
+        th, td {
+            padding: 12px 15px;
+            border: 1px solid #333; /* Border color for dark mode */
+            text-align: center; /* Centered text for better readability */
+        }
+        th {
+            background-color: #1e1e1e; /* Pale yellow-orange color for headers */
+            color: #ffffff; /* White text for headers */
+            font-weight: bold;
+        }
+        tr:nth-child(even) {
+            background-color: #2a2a2a; /* Slightly lighter row for contrast */
+        }
+        tr:nth-child(odd) {
+            background-color: #1e1e1e; /* Darker odd rows */
+        }
+        tr:hover {
+            background-color: #444; /* Highlight row on hover */
+        }
+        h3 {
+            font-size: 22px;
+            color: #f4c542; /* Orange color for the title */
+            font-weight: bold;
+            border-bottom: 2px solid #f4c542;
+            padding-bottom: 5px;
+            margin-bottom: 5px; /* Reduced margin to remove gap */
+        }
+        /* Optionally style the container for better layout */
+        .table-container {
+            background-color: #181818;
+            padding: 15px;
+            border-radius: 10px;
+        }
+    </style>
+    """
+    
+    # Use the title for both the h3 and table
+    html += f"<h3>{title}</h3>"
+    html += '<div class="table-container">'
+    html += "<table><thead><tr>"
+    
+    # Add table headers
+    for header in headers:
+        html += f"<th>{header}</th>"
+    
+    html += "</tr></thead><tbody>"
+    
+    # Add rows to the table, ensuring to handle any missing data gracefully
+    for i in range(num_rows):
+        html += "<tr>"
+        for header in headers:
+            value = data[header][i] if i < len(data[header]) else ""
+            html += f"<td>{value}</td>"
+        html += "</tr>"
+    
+    html += "</tbody></table>"
+    html += "</div>"
+    
+    return html
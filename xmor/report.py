@@ -0,0 +1,134 @@
+"""
+Excel reports for productivity studies.
+
+``study_workbook`` builds the single-study download from the page; it is
+meant to be handed to ``st.download_button`` as a callable so the workbook is
+only written when someone actually asks for it. ``write_study_report`` writes
+any number of studies to one workbook using xlsxwriter's constant-memory
+mode: each row is flushed to disk as soon as the next one starts, so memory
+use does not grow with the number of scenarios.
+"""
+
+import io
+
+from xmor.memo import stage_cache
+from xmor.timing import timed
+
+SHEET_NAME = 'Excavator Simulation Data'
+COLUMNS = ['Description', 'Old Bucket', 'XMOR® Bucket', 'Difference', '% Difference']
+
+# Excel's limit on worksheet name length, and characters it refuses in one
+_MAX_SHEET_NAME = 31
+_SHEET_NAME_FORBIDDEN = str.maketrans('[]:*?/\\', '-------')
+
+_report_stage = stage_cache('report', maxsize=64)
+
+
+def study_rows(result):
+    """(cells, is_title) for the comparison tables, each table preceded by a row holding its title."""
+    for title, table in result.tables.items():
+        yield [title] + [''] * (len(COLUMNS) - 1), True
+        columns = [table[column] for column in COLUMNS]
+        for cells in zip(*columns):
+            yield list(cells), False
+
+
+def describe_scenario(inputs):
+    """One-line summary of a scenario, used to head its block in a report."""
+    text = (f"{inputs.make} {inputs.model}, {inputs.boom_length}m boom, {inputs.arm_length}m arm, "
+            f"{inputs.cwt}kg CWT, {inputs.shoe_width}mm shoes, {inputs.reach}m reach, "
+            f"{inputs.material_density:.0f}kg/m³")
+    if inputs.truck_brand or inputs.truck_model:
+        text += f", {inputs.truck_brand} {inputs.truck_model}".rstrip()
+    return text
+
+
+class _Formats:
+    def __init__(self, workbook):
+        self.header = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+        self.title = workbook.add_format({'bold': True})
+        self.scenario = workbook.add_format({'bold': True, 'font_size': 12, 'bottom': 2})
+
+
+def _write_block(worksheet, row, result, formats):
+    worksheet.write_row(row, 0, COLUMNS, formats.header)
+    row += 1
+    for cells, is_title in study_rows(result):
+        worksheet.write_row(row, 0, cells, formats.title if is_title else None)
+        row += 1
+    return row
+
+
+def study_workbook(result):
+    """
+    xlsx bytes for one study, laid out like the page's tables under a single header row.
+
+    Memoized per StudyResult object; compute_study hands back the same object
+    for the same inputs, so downloading a repeated study reuses its workbook.
+    """
+    # Keyed on identity (results hold dicts, so aren't hashable); the entry keeps
+    # the result alive so its id can't be reused while cached
+    result_held, workbook = _report_stage.get(id(result), lambda: (result, _build_workbook(result)))
+    if result_held is not result:
+        return _build_workbook(result)
+    return workbook
+
+
+@timed('excel_export')
+def _build_workbook(result):
+    import xlsxwriter
+
+    output = io.BytesIO()
+    workbook = xlsxwriter.Workbook(output, {'in_memory': True})
+    formats = _Formats(workbook)
+    worksheet = workbook.add_worksheet(SHEET_NAME)
+    worksheet.set_column(0, 0, 44)
+    worksheet.set_column(1, len(COLUMNS) - 1, 14)
+    _write_block(worksheet, 0, result, formats)
+    workbook.close()
+    return output.getvalue()
+
+
+@timed('excel_report')
+def write_study_report(studies, path, sheet_per_scenario=False):
+    """
+    Write ``(inputs, result)`` pairs to one workbook at ``path``.
+
+    ``studies`` can be a generator, so a batch never has to exist in memory
+    all at once. By default every scenario is a block on one sheet, headed by
+    its description; with ``sheet_per_scenario`` each gets its own sheet.
+    Scenarios without a result are listed with their status. Returns the
+    number of scenarios written.
+    """
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    formats = _Formats(workbook)
+    worksheet = None
+    row = 0
+    count = 0
+    try:
+        for count, (inputs, result) in enumerate(studies, start=1):
+            if worksheet is None or sheet_per_scenario:
+                name = f"{count} {inputs.model}"[:_MAX_SHEET_NAME] if sheet_per_scenario else SHEET_NAME
+                worksheet = workbook.add_worksheet(name.translate(_SHEET_NAME_FORBIDDEN))
+                worksheet.set_column(0, 0, 44)
+                worksheet.set_column(1, len(COLUMNS) - 1, 14)
+                row = 0
+
+            worksheet.write(row, 0, f"{count}. {describe_scenario(inputs)}", formats.scenario)
+            row += 1
+            if result.ok:
+                worksheet.write(row, 0, f"XMOR® Bucket: {result.optimal_bucket.bucket_name} "
+                                        f"({result.optimal_bucket.bucket_size} m³), productivity "
+                                        f"improvement up to {result.productivity_text}")
+                row = _write_block(worksheet, row + 1, result, formats)
+            else:
+                worksheet.write(row, 0, f"No result: {result.status.replace('_', ' ')}")
+                row += 1
+            # Blank row between scenarios
+            row += 1
+    finally:
+        workbook.close()
+    return count
+
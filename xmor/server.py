@@ -0,0 +1,270 @@
+"""
+Local JSON HTTP API over the compute core, for quoting tools.
+
+    python -m xmor.server --port 8060
+
+Endpoints:
+
+    GET  /health   -> {"status": "ok", "catalog_version": ...}
+    GET  /metrics  -> per-stage timing histograms, Prometheus text format
+                      (empty unless started with --timing or XMOR_TIMING set)
+    POST /study    -> one StudyInputs object in, StudyResult.to_dict() out
+    POST /studies  -> {"scenarios": [StudyInputs, ...]} in,
+                      {"results": [compute_studies row, ...]} out
+
+Built on asyncio streams from the standard library, so it needs nothing
+beyond what the core already uses and talks to no outside service. The
+catalog is loaded before the first request. Request bodies are parsed and
+validated on a thread pool, and single studies run there too, since a cold
+one reads and writes the persistent result store (see xmor/store.py) and can
+wait on another process's write lock; their serialized responses are kept in an LRU cache keyed on the catalog version
+and the normalized inputs. Batches run in a process pool whose workers are
+started by a forkserver, never forked from the threaded server. Neither ever
+blocks the event loop, so a slow request never stalls other connections.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import MISSING, fields
+from functools import lru_cache
+
+from xmor import timing
+from xmor.catalog import get_catalog
+from xmor.core import StudyInputs, compute_studies, compute_study
+
+# Responses kept for repeated single-study requests
+CACHE_SIZE = 4096
+
+# Largest request body accepted, in bytes
+MAX_BODY = 32 * 1024 * 1024
+
+_METRICS_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_TEXT_FIELDS = {'make', 'model', 'truck_brand', 'truck_model'}
+_BOOL_FIELDS = {'select_bhc'}
+
+# String spellings accepted for a boolean field, besides JSON true/false
+_TRUE_TEXT = ('true', '1', 'yes', 'y')
+_FALSE_TEXT = ('false', '0', 'no', 'n')
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def normalize_inputs(payload):
+    """Hashable tuple of StudyInputs values with consistent types, so equal requests share a cache entry."""
+    if not isinstance(payload, dict):
+        raise RequestError(400, "Expected a JSON object of study inputs")
+    values = []
+    for field in fields(StudyInputs):
+        if field.name not in payload:
+            if field.default is MISSING:
+                raise RequestError(400, f"Missing field: {field.name}")
+            values.append(field.default)
+            continue
+        value = payload[field.name]
+        invalid = RequestError(400, f"Invalid value for {field.name}: {json.dumps(value)}")
+        if field.name in _TEXT_FIELDS:
+            if not isinstance(value, str):
+                raise invalid
+            value = value.strip()
+        elif field.name in _BOOL_FIELDS:
+            if isinstance(value, str) and value.strip().lower() in _TRUE_TEXT + _FALSE_TEXT:
+                value = value.strip().lower() in _TRUE_TEXT
+            elif not isinstance(value, bool):
+                raise invalid
+        else:
+            # JSON true/false would otherwise pass as 1.0/0.0
+            if isinstance(value, bool):
+                raise invalid
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                raise invalid
+        values.append(value)
+    unknown = set(payload) - {field.name for field in fields(StudyInputs)}
+    if unknown:
+        raise RequestError(400, f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(values)
+
+
+def parse_body(body):
+    try:
+        return json.loads(body or b'null')
+    except ValueError:
+        raise RequestError(400, "Request body is not valid JSON")
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _study_response(catalog_version, key):
+    # catalog_version is only part of the cache key: a changed CSV means fresh entries
+    try:
+        result = compute_study(StudyInputs(*key))
+    except ValueError as e:
+        raise RequestError(400, str(e))
+    return json.dumps(result.to_dict()).encode()
+
+
+def _study_request(catalog, body):
+    # Parsing, validation and the catalog's freshness check run here, on a pool thread, with the study
+    return _study_response(catalog.version, normalize_inputs(parse_body(body)))
+
+
+def _studies_rows(body):
+    # Runs on a pool thread: a batch body can be tens of megabytes of JSON
+    payload = parse_body(body)
+    scenarios = payload.get('scenarios') if isinstance(payload, dict) else None
+    if not isinstance(scenarios, list):
+        raise RequestError(400, 'Expected {"scenarios": [...]}')
+    names = [field.name for field in fields(StudyInputs)]
+    return [dict(zip(names, normalize_inputs(scenario))) for scenario in scenarios]
+
+
+def _studies_response(scenarios):
+    # Runs in a worker process; return the encoded body so only bytes cross back
+    import pandas as pd
+    frame = compute_studies(pd.DataFrame(scenarios), get_catalog())
+    return b'{"results": ' + frame.to_json(orient='records').encode() + b'}'
+
+
+def _warm_worker():
+    # Workers start from a fresh interpreter, so each loads the catalog before its first batch
+    get_catalog().swl_index
+
+
+class StudyServer:
+    def __init__(self, workers=None):
+        self.catalog = get_catalog()
+        # Workers come from a forkserver rather than a fork of this process: the pool starts them
+        # lazily, by which time a pool thread may hold the catalog's or a memo cache's lock, and a
+        # forked child would wait on it forever
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods()
+                                              else None)
+        self.pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, mp_context=context,
+                                        initializer=_warm_worker)
+
+    def warm(self):
+        """Load every dataset and index up front so the first request pays nothing."""
+        catalog = self.catalog
+        catalog.refresh()
+        for index in ('selector_index', 'swl_index', 'bucket_table', 'bhc_bucket_table'):
+            getattr(catalog, index)
+
+    async def dispatch(self, method, path, body):
+        if path == '/health':
+            if method != 'GET':
+                raise RequestError(405, "Use GET")
+            return json.dumps({'status': 'ok', 'catalog_version': self.catalog.version}).encode()
+
+        if path == '/metrics':
+            if method != 'GET':
+                raise RequestError(405, "Use GET")
+            return timing.prometheus_text().encode()
+
+        if path not in ('/study', '/studies'):
+            raise RequestError(404, f"No such endpoint: {path}")
+        if method != 'POST':
+            raise RequestError(405, "Use POST")
+        loop = asyncio.get_running_loop()
+        if path == '/study':
+            with timing.stage('http_study'):
+                return await loop.run_in_executor(None, _study_request, self.catalog, body)
+
+        with timing.stage('http_studies'):
+            rows = await loop.run_in_executor(None, _studies_rows, body)
+            if not rows:
+                return b'{"results": []}'
+            return await loop.run_in_executor(self.pool, _studies_response, rows)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and version.upper() == 'HTTP/1.1')
+                try:
+                    try:
+                        length = int(headers.get('content-length', 0))
+                    except ValueError:
+                        length = -1
+                    if length < 0:
+                        keep_alive = False
+                        raise RequestError(400, "Invalid Content-Length")
+                    if length > MAX_BODY:
+                        keep_alive = False
+                        raise RequestError(413, "Request body too large")
+                    body = await reader.readexactly(length) if length else b''
+                    path = path.split('?', 1)[0]
+                    status, response = 200, await self.dispatch(method, path, body)
+                except RequestError as e:
+                    status, response = e.status, json.dumps({'error': str(e)}).encode()
+                except Exception as e:
+                    status, response = 500, json.dumps({'error': f"{type(e).__name__}: {e}"}).encode()
+
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                    f"Content-Type: {_METRICS_TYPE if status == 200 and path == '/metrics' else 'application/json'}\r\n"
+                    f"Content-Length: {len(response)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + response)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        self.warm()
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m xmor.server', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1', help="Interface to bind (default: localhost only)")
+    parser.add_argument('--port', type=int, default=8060)
+    parser.add_argument('--workers', type=int, default=None, help="Batch worker processes (default: one per core)")
+    parser.add_argument('--timing', action='store_true', help="Collect per-stage timings for /metrics")
+    args = parser.parse_args(argv)
+
+    if args.timing:
+        timing.enable()
+
+    server = StudyServer(args.workers)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+"""
+Persistent study results shared across processes and restarts.
+
+``compute_study`` checks this store after its in-process caches (see
+xmor/memo.py) and before computing, so a configuration any worker has
+studied before comes back from disk after a restart or in another process.
+
+Results live in one SQLite database (``XMOR_RESULT_STORE``, default
+``.cache/results.sqlite3`` next to the CSVs; set it to ``off`` to disable).
+Each row is keyed by a SHA-256 of the normalized StudyInputs plus the catalog
+version and a fingerprint of the code that computes the figures, and holds
+the study as compressed ``StudyResult.to_dict()`` JSON.
+WAL mode lets any number of processes read while one writes, and a busy
+timeout makes concurrent writers wait instead of failing.
+
+When the catalog changes, or a deploy changes the calculation code or its
+constants, the version changes, so old rows stop matching and are deleted
+the first time each process sees the new version. Once the
+stored payloads pass ``max_bytes`` the least recently used rows are evicted
+down to 90% of it. A store that can't be opened or written (read-only disk,
+corrupt file) is skipped rather than failing the study.
+"""
+
+import hashlib
+import importlib.util
+import json
+import marshal
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import fields
+
+from xmor.catalog import DATA_DIR
+
+DEFAULT_PATH = os.path.join(DATA_DIR, '.cache', 'results.sqlite3')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Bump when the stored payload format changes
+FORMAT_VERSION = 1
+
+# Modules whose code (constants included) decides a study's figures and tables, the
+# catalog's CSV parsing and type coercions among them
+FINGERPRINT_MODULES = ('xmor.catalog', 'xmor.compiled', 'xmor.core', 'xmor.engine', 'xmor.index', 'xmor.store')
+
+# A read refreshes its row's last-used time at most this often, in seconds, to keep reads from writing
+TOUCH_INTERVAL = 60.0
+
+# Writes between re-reading the store's total size, which other processes also add to
+SIZE_SYNC_WRITES = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    catalog_version TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+"""
+
+
+_fingerprint = None
+
+
+def code_fingerprint():
+    """Hex SHA-256 over FORMAT_VERSION and the source of FINGERPRINT_MODULES, computed once per process."""
+    global _fingerprint
+    if _fingerprint is None:
+        digest = hashlib.sha256(str(FORMAT_VERSION).encode())
+        for name in FINGERPRINT_MODULES:
+            spec = importlib.util.find_spec(name)
+            try:
+                with open(spec.origin, 'rb') as f:
+                    digest.update(f.read())
+            except (OSError, TypeError):
+                # No readable source (a bytecode-only install): the compiled code changes with it too
+                digest.update(marshal.dumps(spec.loader.get_code(name)))
+        _fingerprint = digest.hexdigest()
+    return _fingerprint
+
+
+def store_version(catalog_version):
+    """What stored rows are valid for: the catalog version plus the code fingerprint."""
+    return f"{catalog_version}/{code_fingerprint()[:16]}"
+
+
+def study_key(inputs, catalog_version):
+    """
+    Hex SHA-256 of the inputs and the store version for ``catalog_version``.
+
+    The inputs are keyed exactly as given; compute_study normalizes them
+    before both computing and storing, so equal inputs share a key and a
+    key's result was computed from those very values.
+    """
+    values = {field.name: getattr(inputs, field.name) for field in fields(inputs)}
+    text = json.dumps([store_version(catalog_version), values], sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class ResultStore:
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._current_version = None
+        self._size = None
+        self._writes = 0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(_SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def _check_version(self, connection, catalog_version):
+        # First sight of a catalog (and code) version in this process: drop rows from any other
+        version = store_version(catalog_version)
+        if version == self._current_version:
+            return
+        with self._lock:
+            if version == self._current_version:
+                return
+            connection.execute('DELETE FROM results WHERE catalog_version != ?', (version,))
+            self._current_version = version
+            self._size = None
+
+    def get(self, inputs, catalog_version):
+        """The stored StudyResult for these inputs and catalog version, or None."""
+        from xmor.core import StudyResult
+
+        key = study_key(inputs, catalog_version)
+        try:
+            connection = self._connection()
+            self._check_version(connection, catalog_version)
+            row = connection.execute('SELECT payload, last_used FROM results WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            payload, last_used = row
+            now = time.time()
+            if now - last_used > TOUCH_INTERVAL:
+                connection.execute('UPDATE results SET last_used = ? WHERE key = ?', (now, key))
+            return StudyResult.from_dict(json.loads(zlib.decompress(payload)))
+        except (sqlite3.Error, OSError, ValueError, zlib.error):
+            return None
+
+    def put(self, inputs, catalog_version, result):
+        """Store ``result``, evicting least recently used rows if the store is over its size limit."""
+        key = study_key(inputs, catalog_version)
+        payload = zlib.compress(json.dumps(result.to_dict()).encode())
+        try:
+            connection = self._connection()
+            self._check_version(connection, catalog_version)
+            connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)',
+                               (key, store_version(catalog_version), payload, len(payload), time.time()))
+            with self._lock:
+                self._writes += 1
+                if self._size is None or self._writes >= SIZE_SYNC_WRITES:
+                    self._size = connection.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+                    self._writes = 0
+                else:
+                    self._size += len(payload)
+                over = self._size > self.max_bytes
+            if over:
+                self.evict()
+        except (sqlite3.Error, OSError):
+            pass
+
+    def evict(self, target=None):
+        """Delete least recently used rows until the payloads total at most ``target`` (90% of max_bytes)."""
+        target = int(self.max_bytes * 0.9) if target is None else target
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+            if total > target:
+                # Running total from the most recently used row back; everything past the target goes
+                connection.execute("""
+                    DELETE FROM results WHERE key IN (
+                        SELECT key FROM (
+                            SELECT key, SUM(size) OVER (ORDER BY last_used DESC, key) AS kept FROM results
+                        ) WHERE kept > ?
+                    )""", (target,))
+                total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        with self._lock:
+            self._size = total
+
+    def clear(self):
+        self._connection().execute('DELETE FROM results')
+        with self._lock:
+            self._size = 0
+
+    def stats(self):
+        rows, size = self._connection().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results').fetchone()
+        return {'path': self.path, 'rows': rows, 'bytes': size, 'max_bytes': self.max_bytes}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """The process-wide ResultStore, or None when XMOR_RESULT_STORE is 'off'."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                setting = os.environ.get('XMOR_RESULT_STORE', '').strip()
+                if setting.lower() in ('off', '0', 'false', 'no'):
+                    _store = False
+                else:
+                    max_bytes = int(os.environ.get('XMOR_RESULT_STORE_MAX_BYTES', DEFAULT_MAX_BYTES))
+                    _store = ResultStore(setting or DEFAULT_PATH, max_bytes)
+    return _store or None
@@ -0,0 +1,198 @@
+"""
+Per-stage timing for the study pipeline and the Streamlit rerun.
+
+Off unless the ``XMOR_TIMING`` environment variable is set (or ``enable()``
+is called). While off, ``stage()`` hands back one shared do-nothing context
+manager and ``timed`` functions make a single flag check, so instrumented
+code costs next to nothing.
+
+While on:
+
+* every stage's duration goes into a process-wide histogram, readable as
+  Prometheus text via ``prometheus_text()`` (served at ``/metrics`` by
+  ``python -m xmor.server``);
+* stages that finish inside a run (``start_run``/``finish_run``, e.g. one
+  page rerun) are also kept on that run, and finishing a run logs its
+  breakdown as one JSON line on the ``xmor.timing`` logger. With
+  ``XMOR_TIMING=log`` those lines are written to stderr without any logging
+  set up.
+
+Stages are recorded as they finish, so a stage nested inside another is
+listed before it and its time is included in the outer stage's.
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger('xmor.timing')
+
+# Upper bounds of the histogram buckets, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_enabled = False
+_current_run = contextvars.ContextVar('xmor_timing_run', default=None)
+_metrics_lock = threading.Lock()
+_metrics = {}
+
+
+def enable(on=True, log_to_stderr=False):
+    """Turn collection on or off for this process."""
+    global _enabled
+    _enabled = on
+    if on and log_to_stderr and not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+
+
+def enabled():
+    return _enabled
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+
+class _Stage:
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record(self.name, time.perf_counter() - self.started)
+        return False
+
+
+def stage(name):
+    """Context manager timing the block as stage ``name``."""
+    return _Stage(name) if _enabled else _NO_STAGE
+
+
+def timed(name):
+    """Decorator timing every call of the function as stage ``name``."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _Stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record(name, seconds):
+    """Add one observation of stage ``name`` to the histogram and to the current run."""
+    with _metrics_lock:
+        entry = _metrics.get(name)
+        if entry is None:
+            entry = _metrics[name] = [[0] * len(BUCKETS), 0, 0.0]
+        for position, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                entry[0][position] += 1
+                break
+        entry[1] += 1
+        entry[2] += seconds
+    run = _current_run.get()
+    if run is not None:
+        run.stages.append((name, seconds))
+
+
+class Run:
+    """Stages recorded during one run (a page rerun, a request), in the order they finished."""
+
+    __slots__ = ('name', 'stages', 'started', 'elapsed', '_token')
+
+    def __init__(self, name):
+        self.name = name
+        self.stages = []
+        self.started = time.perf_counter()
+        self.elapsed = None
+
+    def breakdown(self):
+        """Rows of stage, calls and total milliseconds, by first completion, then the whole run."""
+        totals = {}
+        for name, seconds in self.stages:
+            calls, total = totals.get(name, (0, 0.0))
+            totals[name] = (calls + 1, total + seconds)
+        rows = [{'stage': name, 'calls': calls, 'ms': round(total * 1000, 3)}
+                for name, (calls, total) in totals.items()]
+        if self.elapsed is not None:
+            rows.append({'stage': self.name, 'calls': 1, 'ms': round(self.elapsed * 1000, 3)})
+        return rows
+
+
+def start_run(name):
+    """Begin collecting stages for this thread/task; None while timing is off."""
+    if not _enabled:
+        return None
+    run = Run(name)
+    run._token = _current_run.set(run)
+    return run
+
+
+def finish_run(run):
+    """End ``run``: record its total as a stage of its own and log the breakdown."""
+    if run is None:
+        return
+    run.elapsed = time.perf_counter() - run.started
+    try:
+        _current_run.reset(run._token)
+    except ValueError:
+        # Finished from a different context than it started in
+        _current_run.set(None)
+    record(run.name, run.elapsed)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({'event': 'timing', 'run': run.name, 'total_ms': round(run.elapsed * 1000, 3),
+                                'stages': {row['stage']: row['ms'] for row in run.breakdown()[:-1]}}))
+
+
+def prometheus_text():
+    """All stage histograms in the Prometheus text exposition format."""
+    lines = ['# HELP xmor_stage_seconds Time spent in each stage of the study pipeline.',
+             '# TYPE xmor_stage_seconds histogram']
+    with _metrics_lock:
+        snapshot = {name: (list(counts), count, total) for name, (counts, count, total) in _metrics.items()}
+    for name in sorted(snapshot):
+        counts, count, total = snapshot[name]
+        label = name.replace('\\', '\\\\').replace('"', '\\"')
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS, counts):
+            cumulative += bucket_count
+            lines.append(f'xmor_stage_seconds_bucket{{stage="{label}",le="{bound}"}} {cumulative}')
+        lines.append(f'xmor_stage_seconds_bucket{{stage="{label}",le="+Inf"}} {count}')
+        lines.append(f'xmor_stage_seconds_sum{{stage="{label}"}} {total:.9f}')
+        lines.append(f'xmor_stage_seconds_count{{stage="{label}"}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    """Forget all recorded observations."""
+    with _metrics_lock:
+        _metrics.clear()
+
+
+_setting = os.environ.get('XMOR_TIMING', '').strip().lower()
+if _setting not in ('', '0', 'false', 'no', 'off'):
+    enable(log_to_stderr=_setting == 'log')